@@ -1,16 +1,17 @@
 import os
 import json
-import base64
-import io
+import time
+import threading
 from concurrent.futures import ThreadPoolExecutor
-import numpy as np
-from PIL import Image
 import torch
+from .llm_request_engine import get_engine
+from .llm_response_cache import get_response_cache, make_cache_key
+from .image_encoder import encode_image, IMAGE_FORMATS
 
 try:
-    from openai import OpenAI
+    from server import PromptServer
 except Exception as e:
-    OpenAI = None
+    PromptServer = None
 
 
 class AliyunChat:
@@ -29,34 +30,60 @@ class AliyunChat:
                 "show_reasoning": ("BOOLEAN", {"default": True}),
                 "temperature": ("FLOAT", {"default": 0.7, "min": 0.0, "max": 2.0, "step": 0.1}),
                 "max_tokens": ("INT", {"default": 1024, "min": 1, "max": 8192}),
+                "stream": ("BOOLEAN", {"default": False}),
+                "use_cache": ("BOOLEAN", {"default": False}),
+                "cache_ttl_hours": ("FLOAT", {"default": 24.0, "min": 0.0, "max": 8760.0, "step": 1.0}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             },
         }
 
-    RETURN_TYPES = ("STRING", "STRING")
-    RETURN_NAMES = ("content", "reasoning")
+    RETURN_TYPES = ("STRING", "STRING", "FLOAT", "FLOAT", "STRING", "BOOLEAN")
+    RETURN_NAMES = ("content", "reasoning", "ttft_ms", "tokens_per_sec", "usage", "cache_hit")
     FUNCTION = "run"
     CATEGORY = "🐟Koi-Toolkit"
 
-    def _get_client(self, api_key, base_url):
+    # 流式输出推送到前端的最小间隔（秒），避免每个 token 都发送一次消息
+    STREAM_UI_INTERVAL = 0.2
+
+    def _resolve_api_key(self, api_key):
         key = (api_key or os.getenv("DASHSCOPE_API_KEY") or "").strip()
         if not key:
             raise RuntimeError("DASHSCOPE_API_KEY 未设置，且未提供 api_key")
-        if OpenAI is None:
-            raise RuntimeError("openai 库未安装，请在该插件的 requirements.txt 中添加 openai 并安装")
-        return OpenAI(api_key=key, base_url=base_url)
-
-    def _aggregate_stream(self, stream_iter, include_usage):
+        return key
+
+    def _create_completion(self, api_key, base_url, payload, limiter=None):
+        # 通过共享请求引擎调用 OpenAI 兼容接口（带重试、限速与熔断）
+        url = base_url.rstrip("/") + "/chat/completions"
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        return get_engine().request_json_sync(
+            "POST", url, base_url=base_url, api_key=api_key, headers=headers, json=payload, timeout=300.0,
+            limiter=limiter,
+        )
+
+    def _create_completion_stream(self, api_key, base_url, payload):
+        url = base_url.rstrip("/") + "/chat/completions"
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        return get_engine().stream_json_sync(
+            "POST", url, base_url=base_url, api_key=api_key, headers=headers, json=payload, timeout=300.0
+        )
+
+    def _aggregate_stream(self, stream_iter, include_usage, on_delta=None):
         content_parts = []
         reasoning_parts = []
         usage_obj = None
         for event in stream_iter:
-            try:
-                data = event.model_dump()
-            except Exception:
+            if isinstance(event, dict):
+                data = event
+            else:
                 try:
-                    data = json.loads(str(event))
+                    data = event.model_dump()
                 except Exception:
-                    data = {}
+                    try:
+                        data = json.loads(str(event))
+                    except Exception:
+                        data = {}
             choices = data.get("choices") or []
             for ch in choices:
                 delta = ch.get("delta") or {}
@@ -67,6 +94,8 @@ class AliyunChat:
                 rc = delta.get("reasoning_content") or msg.get("reasoning_content")
                 if rc:
                     reasoning_parts.append(rc)
+                if on_delta is not None and (c or rc):
+                    on_delta(c or "", rc or "")
             if include_usage and (data.get("usage") is not None):
                 usage_obj = data.get("usage")
         content = "".join(content_parts).strip()
@@ -74,13 +103,16 @@ class AliyunChat:
         return content, reasoning, usage_obj or {}
 
     def _aggregate_non_stream(self, resp):
-        try:
-            data = resp.model_dump()
-        except Exception:
+        if isinstance(resp, dict):
+            data = resp
+        else:
             try:
-                data = json.loads(str(resp))
+                data = resp.model_dump()
             except Exception:
-                data = {}
+                try:
+                    data = json.loads(str(resp))
+                except Exception:
+                    data = {}
         content = ""
         reasoning = ""
         try:
@@ -93,6 +125,67 @@ class AliyunChat:
             pass
         return content, reasoning
 
+    def _cache_lookup(self, use_cache, base_url, payload):
+        """返回 (cache_key, 缓存的响应)；未启用缓存时 cache_key 为 None。"""
+        if not use_cache:
+            return None, None
+        key = make_cache_key(base_url, payload)
+        return key, get_response_cache().get(key)
+
+    def _cache_store(self, key, ttl_hours, content, reasoning, usage=None):
+        if key is None or ttl_hours <= 0:
+            return
+        value = {"choices": [{"message": {"content": content, "reasoning_content": reasoning}}], "usage": usage or {}}
+        get_response_cache().set(key, value, ttl_hours * 3600.0)
+
+    def _format_ui_text(self, content, reasoning, show_reasoning):
+        if show_reasoning and reasoning:
+            return f"[Reasoning]\n{reasoning}\n\n[Answer]\n{content}"
+        return content
+
+    def _run_stream(self, api_key, base_url, payload, show_reasoning, unique_id):
+        """流式请求：增量推送文本到前端，并统计首 token 延迟与生成速度。"""
+        payload = dict(payload, stream=True, stream_options={"include_usage": True})
+        start = time.perf_counter()
+        state = {"first": None, "chunks": 0, "pushed": 0.0, "content": [], "reasoning": []}
+
+        def on_delta(c, rc):
+            now = time.perf_counter()
+            if state["first"] is None:
+                state["first"] = now
+            state["chunks"] += 1
+            state["content"].append(c)
+            state["reasoning"].append(rc)
+            if PromptServer is None or unique_id is None or now - state["pushed"] < self.STREAM_UI_INTERVAL:
+                return
+            state["pushed"] = now
+            text = self._format_ui_text("".join(state["content"]), "".join(state["reasoning"]), show_reasoning)
+            try:
+                PromptServer.instance.send_progress_text(text, unique_id)
+            except Exception:
+                pass
+
+        content, reasoning, usage = self._aggregate_stream(
+            self._create_completion_stream(api_key, base_url, payload), True, on_delta
+        )
+        end = time.perf_counter()
+        first = state["first"] if state["first"] is not None else end
+        # 优先使用服务端返回的 completion_tokens，缺失时以增量块数近似
+        tokens = (usage or {}).get("completion_tokens") or state["chunks"]
+        decode_time = end - first
+        tokens_per_sec = tokens / decode_time if decode_time > 0 else 0.0
+        return content, reasoning, (first - start) * 1000.0, tokens_per_sec, usage or {}
+
+    def _run_blocking(self, api_key, base_url, payload):
+        start = time.perf_counter()
+        result = self._create_completion(api_key, base_url, payload)
+        elapsed = time.perf_counter() - start
+        content, reasoning = self._aggregate_non_stream(result)
+        usage = result.get("usage") or {}
+        tokens = usage.get("completion_tokens") or 0
+        # 非流式时首 token 与完整响应同时到达
+        return content, reasoning, elapsed * 1000.0, tokens / elapsed if elapsed > 0 else 0.0, usage
+
     def run(
         self,
         model,
@@ -104,8 +197,12 @@ class AliyunChat:
         show_reasoning=True,
         temperature=0.7,
         max_tokens=1024,
+        stream=False,
+        use_cache=False,
+        cache_ttl_hours=24.0,
+        unique_id=None,
     ):
-        client = self._get_client(api_key, base_url)
+        api_key = self._resolve_api_key(api_key)
 
         messages = []
         if system_prompt:
@@ -119,12 +216,32 @@ class AliyunChat:
             "max_tokens": int(max_tokens),
         }
 
-        kwargs["extra_body"] = {"enable_thinking": bool(enable_thinking)}
-        result = client.chat.completions.create(**kwargs)
-        content, reasoning = self._aggregate_non_stream(result)
+        kwargs["enable_thinking"] = bool(enable_thinking)
+        cache_key, cached = self._cache_lookup(use_cache, base_url, kwargs)
+        if cached is not None:
+            content, reasoning = self._aggregate_non_stream(cached)
+            ttft_ms, tokens_per_sec, usage = 0.0, 0.0, cached.get("usage") or {}
+        else:
+            if stream:
+                content, reasoning, ttft_ms, tokens_per_sec, usage = self._run_stream(
+                    api_key, base_url, kwargs, show_reasoning, unique_id
+                )
+            else:
+                content, reasoning, ttft_ms, tokens_per_sec, usage = self._run_blocking(api_key, base_url, kwargs)
+            self._cache_store(cache_key, cache_ttl_hours, content, reasoning, usage)
 
-        ui_text = content if not (show_reasoning and reasoning) else f"[Reasoning]\n{reasoning}\n\n[Answer]\n{content}"
-        return {"ui": {"text": [ui_text]}, "result": (content, reasoning if show_reasoning else "")}
+        ui_text = self._format_ui_text(content, reasoning, show_reasoning)
+        return {
+            "ui": {"text": [ui_text]},
+            "result": (
+                content,
+                reasoning if show_reasoning else "",
+                ttft_ms,
+                tokens_per_sec,
+                json.dumps(usage, ensure_ascii=False),
+                cached is not None,
+            ),
+        }
 
 
 class AliyunVLChat(AliyunChat):
@@ -142,23 +259,22 @@ class AliyunVLChat(AliyunChat):
                 "base_url": ("STRING", {"default": "https://dashscope.aliyuncs.com/compatible-mode/v1"}),
                 "temperature": ("FLOAT", {"default": 0.7, "min": 0.0, "max": 2.0, "step": 0.1}),
                 "max_tokens": ("INT", {"default": 1024, "min": 1, "max": 8192}),
+                "use_cache": ("BOOLEAN", {"default": False}),
+                "cache_ttl_hours": ("FLOAT", {"default": 24.0, "min": 0.0, "max": 8760.0, "step": 1.0}),
+                "image_max_side": ("INT", {"default": 0, "min": 0, "max": 8192, "step": 64}),
+                "image_format": (IMAGE_FORMATS, {"default": "JPEG"}),
+                "image_quality": ("INT", {"default": 75, "min": 1, "max": 100}),
             },
         }
 
-    RETURN_TYPES = ("STRING", "STRING")
-    RETURN_NAMES = ("content", "reasoning")
+    RETURN_TYPES = ("STRING", "STRING", "BOOLEAN")
+    RETURN_NAMES = ("content", "reasoning", "cache_hit")
     FUNCTION = "run"
     CATEGORY = "🐟Koi-Toolkit"
 
-    def _image_to_base64(self, image):
-        if len(image.shape) == 4:
-            image = image[0]
-        i = 255. * image.cpu().numpy()
-        img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-        buffered = io.BytesIO()
-        img.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return f"data:image/jpeg;base64,{img_str}"
+    def _image_to_base64(self, image, max_side=0, fmt="JPEG", quality=75):
+        """返回 (data URI, 图像载荷字节数)；载荷大小由调用方显示在节点 UI 中。"""
+        return encode_image(image, max_side, fmt, quality)
 
     def run(
         self,
@@ -170,9 +286,14 @@ class AliyunVLChat(AliyunChat):
         base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
         temperature=0.7,
         max_tokens=1024,
+        use_cache=False,
+        cache_ttl_hours=24.0,
+        image_max_side=0,
+        image_format="JPEG",
+        image_quality=75,
     ):
-        client = self._get_client(api_key, base_url)
-        image_url = self._image_to_base64(image)
+        api_key = self._resolve_api_key(api_key)
+        image_url, payload_bytes = self._image_to_base64(image, image_max_side, image_format, image_quality)
 
         messages = []
         if system_prompt:
@@ -191,10 +312,16 @@ class AliyunVLChat(AliyunChat):
             "max_tokens": int(max_tokens),
         }
 
-        result = client.chat.completions.create(**kwargs)
-        content, reasoning = self._aggregate_non_stream(result)
+        cache_key, cached = self._cache_lookup(use_cache, base_url, kwargs)
+        if cached is not None:
+            content, reasoning = self._aggregate_non_stream(cached)
+        else:
+            result = self._create_completion(api_key, base_url, kwargs)
+            content, reasoning = self._aggregate_non_stream(result)
+            self._cache_store(cache_key, cache_ttl_hours, content, reasoning, result.get("usage"))
 
-        return {"ui": {"text": [content]}, "result": (content, reasoning)}
+        ui_text = f"image payload {payload_bytes / 1024:.1f} KB ({image_format}, max_side={image_max_side})\n{content}"
+        return {"ui": {"text": [ui_text]}, "result": (content, reasoning, cached is not None)}
 
 
 class AliyunConcurrentVLChat(AliyunVLChat):
@@ -221,7 +348,7 @@ class AliyunConcurrentVLChat(AliyunVLChat):
             },
         }
 
-    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING", "STRING")
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING")
     RETURN_NAMES = (
         "content1",
         "reasoning1",
@@ -229,12 +356,16 @@ class AliyunConcurrentVLChat(AliyunVLChat):
         "reasoning2",
         "content3",
         "reasoning3",
+        "error1",
+        "error2",
+        "error3",
     )
     FUNCTION = "run"
     CATEGORY = "🐟Koi-Toolkit"
 
-    def _build_messages(self, image, user_message, system_prompt):
-        image_url = self._image_to_base64(image)
+    def _build_messages(self, image, user_message, system_prompt, max_side=0, fmt="JPEG", quality=75):
+        """返回 (messages, 图像载荷字节数)；不逐张打印，由调用方汇总。"""
+        image_url, payload_bytes = encode_image(image, max_side, fmt, quality)
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
@@ -244,21 +375,23 @@ class AliyunConcurrentVLChat(AliyunVLChat):
             content_list.append({"type": "text", "text": user_message})
 
         messages.append({"role": "user", "content": content_list})
-        return messages
+        return messages, payload_bytes
 
-    def _call_single(self, client, model, temperature, max_tokens, image, user_message, system_prompt):
+    def _call_single(self, api_key, base_url, model, temperature, max_tokens, image, user_message, system_prompt):
+        """返回 (content, reasoning, error)；失败时错误单独输出，不混入 reasoning。"""
         try:
-            messages = self._build_messages(image, user_message, system_prompt)
+            messages, _ = self._build_messages(image, user_message, system_prompt)
             kwargs = {
                 "model": model,
                 "messages": messages,
                 "temperature": float(temperature),
                 "max_tokens": int(max_tokens),
             }
-            resp = client.chat.completions.create(**kwargs)
-            return self._aggregate_non_stream(resp)
+            resp = self._create_completion(api_key, base_url, kwargs)
+            content, reasoning = self._aggregate_non_stream(resp)
+            return content, reasoning, ""
         except Exception as e:
-            return "", f"error: {e}"
+            return "", "", f"{type(e).__name__}: {e}"
 
     def run(
         self,
@@ -277,7 +410,7 @@ class AliyunConcurrentVLChat(AliyunVLChat):
         temperature=0.7,
         max_tokens=1024,
     ):
-        client = self._get_client(api_key, base_url)
+        api_key = self._resolve_api_key(api_key)
 
         requests = [
             ("1", image1, user_message1, system_prompt1),
@@ -285,7 +418,7 @@ class AliyunConcurrentVLChat(AliyunVLChat):
             ("3", image3, user_message3, system_prompt3),
         ]
 
-        results = {"1": ("", ""), "2": ("", ""), "3": ("", "")}
+        results = {"1": ("", "", ""), "2": ("", "", ""), "3": ("", "", "")}
         ui_texts = []
 
         with ThreadPoolExecutor(max_workers=3) as executor:
@@ -295,7 +428,8 @@ class AliyunConcurrentVLChat(AliyunVLChat):
                     continue
                 futures[key] = executor.submit(
                     self._call_single,
-                    client,
+                    api_key,
+                    base_url,
                     model,
                     temperature,
                     max_tokens,
@@ -308,12 +442,13 @@ class AliyunConcurrentVLChat(AliyunVLChat):
                 results[key] = future.result()
 
         for key in ["1", "2", "3"]:
-            content, reasoning = results[key]
-            if content:
-                label = f"[{key}] "
+            content, reasoning, error = results[key]
+            label = f"[{key}] "
+            if error:
+                ui_texts.append(f"{label}{error}")
+            elif content:
                 ui_texts.append(f"{label}{content}")
             elif reasoning:
-                label = f"[{key}] "
                 ui_texts.append(f"{label}{reasoning}")
 
         return {
@@ -325,18 +460,176 @@ class AliyunConcurrentVLChat(AliyunVLChat):
                 results["2"][1],
                 results["3"][0],
                 results["3"][1],
+                results["1"][2],
+                results["2"][2],
+                results["3"][2],
             ),
         }
 
 
+# 批量节点共享的常驻线程池，跨多次执行复用，仅在并发上限变化时重建
+_BATCH_POOL = None
+_BATCH_POOL_SIZE = 0
+_BATCH_POOL_LOCK = threading.Lock()
+
+
+def _get_batch_pool(max_workers):
+    global _BATCH_POOL, _BATCH_POOL_SIZE
+    with _BATCH_POOL_LOCK:
+        if _BATCH_POOL is None or _BATCH_POOL_SIZE != max_workers:
+            if _BATCH_POOL is not None:
+                _BATCH_POOL.shutdown(wait=False)
+            _BATCH_POOL = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="koi-vl-batch")
+            _BATCH_POOL_SIZE = max_workers
+        return _BATCH_POOL
+
+
+class AliyunBatchVLChat(AliyunConcurrentVLChat):
+    """对整批图像 + 提示词列表并发调用 VL 模型，按输入顺序返回列表结果。"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image": ("IMAGE",),
+                "model": ("STRING", {"default": "qwen3-vl-plus"}),
+            },
+            "optional": {
+                "user_messages": ("STRING", {"default": "Describe this image.", "multiline": True}),
+                "system_prompt": ("STRING", {"default": "", "multiline": True}),
+                "api_key": ("STRING", {"default": ""}),
+                "base_url": ("STRING", {"default": "https://dashscope.aliyuncs.com/compatible-mode/v1"}),
+                "temperature": ("FLOAT", {"default": 0.2, "min": 0.0, "max": 2.0, "step": 0.1}),
+                "max_tokens": ("INT", {"default": 1024, "min": 1, "max": 8192}),
+                "max_concurrency": ("INT", {"default": 8, "min": 1, "max": 64}),
+                "requests_per_second": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 100.0, "step": 0.5}),
+                "image_max_side": ("INT", {"default": 0, "min": 0, "max": 8192, "step": 64}),
+                "image_format": (IMAGE_FORMATS, {"default": "JPEG"}),
+                "image_quality": ("INT", {"default": 75, "min": 1, "max": 100}),
+            },
+        }
+
+    INPUT_IS_LIST = True
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("content", "reasoning", "error")
+    OUTPUT_IS_LIST = (True, True, True)
+    FUNCTION = "run"
+    CATEGORY = "🐟Koi-Toolkit"
+
+    @staticmethod
+    def _first(value, default):
+        if isinstance(value, list):
+            return value[0] if value else default
+        return default if value is None else value
+
+    def _call_batch_item(self, api_key, base_url, model, temperature, max_tokens, image, user_message, system_prompt,
+                         limiter=None, image_options=(0, "JPEG", 75)):
+        """返回 (content, reasoning, error, 图像载荷字节数)。"""
+        payload_bytes = 0
+        try:
+            messages, payload_bytes = self._build_messages(image, user_message, system_prompt, *image_options)
+            resp = self._create_completion(api_key, base_url, {
+                "model": model,
+                "messages": messages,
+                "temperature": float(temperature),
+                "max_tokens": int(max_tokens),
+            }, limiter)
+            content, reasoning = self._aggregate_non_stream(resp)
+            return content, reasoning, "", payload_bytes
+        except Exception as e:
+            return "", "", f"{type(e).__name__}: {e}", payload_bytes
+
+    def run(
+        self,
+        image,
+        model,
+        user_messages=None,
+        system_prompt=None,
+        api_key=None,
+        base_url=None,
+        temperature=None,
+        max_tokens=None,
+        max_concurrency=None,
+        requests_per_second=None,
+        image_max_side=None,
+        image_format=None,
+        image_quality=None,
+    ):
+        model = self._first(model, "qwen3-vl-plus")
+        system_prompt = self._first(system_prompt, "")
+        api_key = self._first(api_key, "")
+        base_url = self._first(base_url, "https://dashscope.aliyuncs.com/compatible-mode/v1")
+        temperature = self._first(temperature, 0.2)
+        max_tokens = self._first(max_tokens, 1024)
+        max_concurrency = int(self._first(max_concurrency, 8))
+        requests_per_second = float(self._first(requests_per_second, 0.0))
+        image_options = (
+            int(self._first(image_max_side, 0)),
+            self._first(image_format, "JPEG"),
+            int(self._first(image_quality, 75)),
+        )
+
+        # 展开所有输入批次为单帧列表 [1,H,W,C]
+        frames = []
+        for batch in image:
+            if batch.dim() == 3:
+                batch = batch.unsqueeze(0)
+            frames.extend(batch[i:i + 1] for i in range(batch.shape[0]))
+
+        prompts = user_messages if isinstance(user_messages, list) else [user_messages or ""]
+        prompts = prompts or [""]
+        if len(prompts) != 1 and len(prompts) != len(frames):
+            raise ValueError(f"提示词数量 ({len(prompts)}) 与图像数量 ({len(frames)}) 不匹配，应为 1 或相等")
+
+        api_key = self._resolve_api_key(api_key)
+        # 本次运行独立的令牌桶，只约束本批请求，不影响其他节点
+        limiter = get_engine().create_rate_limiter(requests_per_second) if requests_per_second > 0 else None
+        pool = _get_batch_pool(max_concurrency)
+
+        futures = [
+            pool.submit(
+                self._call_batch_item,
+                api_key,
+                base_url,
+                model,
+                temperature,
+                max_tokens,
+                frame,
+                prompts[i] if len(prompts) > 1 else prompts[0],
+                system_prompt,
+                limiter,
+                image_options,
+            )
+            for i, frame in enumerate(frames)
+        ]
+        results = [f.result() for f in futures]
+
+        contents = [r[0] for r in results]
+        reasonings = [r[1] for r in results]
+        errors = [r[2] for r in results]
+
+        failed = sum(1 for e in errors if e)
+        payload_kb = sum(r[3] for r in results) / 1024
+        # 每次运行只汇总一次图像载荷大小，避免逐张打印刷屏
+        print(f"[{type(self).__name__}] {len(results)} images, payload {payload_kb:.1f} KB "
+              f"({image_options[1]}, max_side={image_options[0]})")
+        ui_text = f"{len(results) - failed}/{len(results)} succeeded, image payload {payload_kb:.1f} KB"
+        if failed:
+            ui_text += "\n" + "\n".join(f"[{i}] {e}" for i, e in enumerate(errors) if e)
+
+        return {"ui": {"text": [ui_text]}, "result": (contents, reasonings, errors)}
+
+
 NODE_CLASS_MAPPINGS = {
     "AliyunChat": AliyunChat,
     "AliyunVLChat": AliyunVLChat,
     "AliyunConcurrentVLChat": AliyunConcurrentVLChat,
+    "AliyunBatchVLChat": AliyunBatchVLChat,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "AliyunChat": "Aliyun Chat",
     "AliyunVLChat": "Aliyun VL Chat",
     "AliyunConcurrentVLChat": "Aliyun VL Chat (Concurrent)",
+    "AliyunBatchVLChat": "Aliyun VL Chat (Batch)",
 }
@@ -0,0 +1,99 @@
+"""MaskFilterByInclusion 基准：旧版逐标签循环与 bincount + 查找表实现的耗时对比，并检查输出一致。
+
+    python benchmarks/bench_mask_filter_by_inclusion.py --components 10000 --threshold 0.5
+
+待过滤 mask 由网格排布、大小随机的方块组成（每个方块一个连通域）；参考 mask 为随机噪声，
+各连通域的重叠比例分布在阈值两侧，约一半被移除。旧版每个标签都要扫描整幅图，耗时随连通域数线性增长。
+"""
+import argparse
+import importlib.util
+import math
+import os
+import sys
+import time
+import types
+
+import cv2
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(name):
+    if PACKAGE_DIR not in sys.modules:
+        package = types.ModuleType(PACKAGE_DIR)
+        package.__path__ = [PACKAGE_DIR]
+        sys.modules[PACKAGE_DIR] = package
+    spec = importlib.util.spec_from_file_location(f"{PACKAGE_DIR}.{name}", os.path.join(PACKAGE_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def filter_per_label(m1, m2, threshold):
+    """优化前的单帧实现：每个标签生成一次整幅布尔 mask 并分别求面积与重叠。"""
+    m1_uint8 = (m1 > 0.5).astype(np.uint8)
+    m2_uint8 = (m2 > 0.5).astype(np.uint8)
+    num_labels, labels = cv2.connectedComponents(m1_uint8)
+    out_m = m1.copy()
+    for label in range(1, num_labels):
+        component_mask = (labels == label)
+        component_area = np.sum(component_mask)
+        if component_area == 0:
+            continue
+        overlap_count = np.sum(m2_uint8[component_mask])
+        ratio = overlap_count / component_area
+        if ratio >= threshold:
+            out_m[component_mask] = 0.0
+    return out_m
+
+
+def make_masks(components, cell=6, seed=0):
+    rng = np.random.default_rng(seed)
+    side = math.ceil(math.sqrt(components))
+    size = side * cell
+    m1 = np.zeros((size, size), dtype=np.float32)
+    # 方块边长 1..cell-1，相邻方块之间至少隔一像素，保证互不连通
+    extents = rng.integers(1, cell, size=components)
+    for k, extent in enumerate(extents):
+        y, x = divmod(k, side)
+        m1[y * cell:y * cell + extent, x * cell:x * cell + extent] = 1.0
+    m2 = (rng.random((size, size)) > 0.5).astype(np.float32)
+    return m1, m2
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--components", type=int, default=10000)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--old-repeat", type=int, default=1, help="旧版耗时很长，默认只跑一次")
+    args = parser.parse_args()
+
+    node = load_module("mask_filter_by_inclusion").MaskFilterByInclusion
+    m1, m2 = make_masks(args.components)
+    num_labels = cv2.connectedComponents((m1 > 0.5).astype(np.uint8))[0] - 1
+    print(f"{m1.shape[1]}x{m1.shape[0]} mask, {num_labels} components, threshold={args.threshold}")
+
+    old_time, reference = best_of(args.old_repeat, lambda: filter_per_label(m1, m2, args.threshold))
+    references = (m2 > 0.5).astype(np.uint8)
+    new_time, result = best_of(args.repeat, lambda: node._filter_single(m1, references, args.threshold))
+    removed = num_labels - (cv2.connectedComponents((reference > 0.5).astype(np.uint8))[0] - 1)
+
+    print(f"per-label loop (old)  {old_time:8.3f}s")
+    print(f"bincount + LUT        {new_time:8.4f}s  x{old_time / new_time:.0f} vs old")
+    print(f"removed {removed} components  identical={np.array_equal(result, reference)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Potrace 路径序列化基准：旧版逐段 f-string 与 path_data（绝对 / 相对坐标）的耗时与输出大小对比。
+
+    python benchmarks/bench_potrace_serialize.py --size 1536 --block 4 --segments 100000
+
+先用 potracer 追踪一张斑块图，段数不足 --segments 时重复其路径列表补足，
+因此序列化的输入就是真实追踪结果。绝对坐标、默认精度下的输出应与旧版逐字节相同。
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(name):
+    if PACKAGE_DIR not in sys.modules:
+        package = types.ModuleType(PACKAGE_DIR)
+        package.__path__ = [PACKAGE_DIR]
+        sys.modules[PACKAGE_DIR] = package
+    spec = importlib.util.spec_from_file_location(f"{PACKAGE_DIR}.{name}", os.path.join(PACKAGE_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def path_data_fstring(plist, scale=1.0):
+    """优化前的序列化实现：逐段 hasattr 检查并各自格式化为 f-string。"""
+    all_paths_svg_parts = []
+    for curve in plist:
+        if not (hasattr(curve, 'start_point') and hasattr(curve.start_point, 'x') and hasattr(curve.start_point, 'y')):
+            continue
+        fs = curve.start_point
+        all_paths_svg_parts.append(f"M{fs.x * scale:.2f},{fs.y * scale:.2f}")
+
+        if not hasattr(curve, 'segments'):
+            continue
+        for segment in curve.segments:
+            valid_segment = True
+            if not (hasattr(segment, 'is_corner') and hasattr(segment, 'end_point') and hasattr(segment.end_point, 'x') and hasattr(segment.end_point, 'y')):
+                valid_segment = False
+
+            if valid_segment and segment.is_corner:
+                if not (hasattr(segment, 'c') and hasattr(segment.c, 'x') and hasattr(segment.c, 'y')):
+                    valid_segment = False
+                else:
+                    c_x = segment.c.x * scale
+                    c_y = segment.c.y * scale
+                    ep_x = segment.end_point.x * scale
+                    ep_y = segment.end_point.y * scale
+                    all_paths_svg_parts.append(f"L{c_x:.2f},{c_y:.2f}L{ep_x:.2f},{ep_y:.2f}")
+            elif valid_segment:
+                if not (hasattr(segment, 'c1') and hasattr(segment.c1, 'x') and hasattr(segment.c1, 'y') and \
+                        hasattr(segment, 'c2') and hasattr(segment.c2, 'x') and hasattr(segment.c2, 'y')):
+                    valid_segment = False
+                else:
+                    c1_x = segment.c1.x * scale; c1_y = segment.c1.y * scale
+                    c2_x = segment.c2.x * scale; c2_y = segment.c2.y * scale
+                    ep_x = segment.end_point.x * scale; ep_y = segment.end_point.y * scale
+                    all_paths_svg_parts.append(f"C{c1_x:.2f},{c1_y:.2f} {c2_x:.2f},{c2_y:.2f} {ep_x:.2f},{ep_y:.2f}")
+        all_paths_svg_parts.append("Z")
+    return "".join(all_paths_svg_parts)
+
+
+def make_bitmap(size, block, seed=0):
+    # 平滑噪声阈值化得到的斑块图，形状复杂度接近扫描线稿
+    rng = np.random.default_rng(seed)
+    coarse = rng.random((size // block + 1, size // block + 1))
+    return np.repeat(np.repeat(coarse, block, axis=0), block, axis=1)[:size, :size] > 0.5
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1536)
+    parser.add_argument("--block", type=int, default=4)
+    parser.add_argument("--segments", type=int, default=100000)
+    parser.add_argument("--scale", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    svg_potrace = load_module("svg_potrace")
+    params = {"turdsize": 2, "turnpolicy": 4, "alphamax": 1.0, "opticurve": True, "opttolerance": 0.2}
+    start = time.perf_counter()
+    traced = list(svg_potrace.trace_bitmap(make_bitmap(args.size, args.block), params))
+    trace_time = time.perf_counter() - start
+    traced_segments = sum(len(curve.segments) for curve in traced)
+    plist = traced * max(1, -(-args.segments // max(1, traced_segments)))
+    segments = sum(len(curve.segments) for curve in plist)
+    print(f"traced {len(traced)} curves / {traced_segments} segments in {trace_time:.2f}s; "
+          f"serializing {len(plist)} curves / {segments} segments, scale={args.scale}")
+
+    old_time, reference = best_of(args.repeat, lambda: path_data_fstring(plist, args.scale))
+    print(f"{'f-string (old)':<22} {old_time:7.3f}s  {segments / old_time / 1e3:7.0f}k seg/s  "
+          f"{len(reference) / 1e6:6.2f} MB")
+    cases = [
+        ("absolute p2", dict(precision=2, relative=False)),
+        ("absolute p1", dict(precision=1, relative=False)),
+        ("relative p2", dict(precision=2, relative=True)),
+        ("relative p1", dict(precision=1, relative=True)),
+    ]
+    for label, options in cases:
+        elapsed, result = best_of(args.repeat, lambda: svg_potrace.path_data(plist, args.scale, **options))
+        line = (f"{'path_data ' + label:<22} {elapsed:7.3f}s  {segments / elapsed / 1e3:7.0f}k seg/s  "
+                f"{len(result) / 1e6:6.2f} MB  x{old_time / elapsed:.2f} vs old  "
+                f"size {len(result) / len(reference):.2f} of old")
+        if label == "absolute p2":
+            line += f"  identical={result == reference}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,77 @@ from PIL import Image, ImageOps
 import requests
 import io
 import json
+import threading
+import time
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+
+# Add headers to mimic a browser to avoid some 403s
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+# Total bytes kept in the in-memory download cache
+DOWNLOAD_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Seconds a cached body stays valid
+DOWNLOAD_CACHE_TTL = 600
+
+_session = None
+_session_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def get_session():
+    """Shared requests.Session with connection pooling, reused by all download callers."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers.update(DEFAULT_HEADERS)
+        return _session
+
+
+def _cache_drop(url):
+    global _cache_bytes
+    _, old = _cache.pop(url)
+    _cache_bytes -= len(old)
+
+
+def fetch_url_bytes(url, timeout=15, use_cache=False, cache_ttl=DOWNLOAD_CACHE_TTL):
+    """Download url through the pooled session.
+
+    With use_cache=True successful bodies are kept for cache_ttl seconds in a byte-bounded LRU;
+    only use it for immutable URLs (e.g. generated output images), never for content that may change.
+    Raises requests.HTTPError for non-200 responses.
+    """
+    global _cache_bytes
+    if use_cache:
+        with _cache_lock:
+            entry = _cache.get(url)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    _cache.move_to_end(url)
+                    return entry[1]
+                _cache_drop(url)
+
+    response = get_session().get(url, timeout=timeout)
+    if response.status_code != 200:
+        raise requests.HTTPError(f"Status {response.status_code}", response=response)
+    content = response.content
+
+    if use_cache and cache_ttl > 0 and len(content) <= DOWNLOAD_CACHE_MAX_BYTES:
+        with _cache_lock:
+            if url in _cache:
+                _cache_drop(url)
+            _cache[url] = (time.monotonic() + cache_ttl, content)
+            _cache_bytes += len(content)
+            while _cache_bytes > DOWNLOAD_CACHE_MAX_BYTES:
+                _cache_drop(next(iter(_cache)))
+    return content
+
 
 class DownloadImagesFromUrls:
     @classmethod
@@ -60,33 +131,28 @@ class DownloadImagesFromUrls:
                 continue
             
             try:
-                # Add headers to mimic a browser to avoid some 403s
-                headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-                response = requests.get(url, headers=headers, timeout=15)
-                
-                if response.status_code == 200:
-                    i = Image.open(io.BytesIO(response.content))
-                    i = ImageOps.exif_transpose(i) # Handle orientation
-
-                    if not keep_alpha_channel:
-                        i = i.convert("RGB")
-                    else:
-                        i = i.convert("RGBA")
-
-                    # Handle resizing to match batch
-                    if len(images) == 0:
-                        first_width = i.width
-                        first_height = i.height
-                    else:
-                        if i.width != first_width or i.height != first_height:
-                            # Resize to match the first image
-                            i = i.resize((first_width, first_height), Image.LANCZOS)
-
-                    image = np.array(i).astype(np.float32) / 255.0
-                    image = torch.from_numpy(image)[None,]
-                    images.append(image)
+                # URLs here may point at changing content, so they are always fetched fresh
+                content = fetch_url_bytes(url, timeout=15, use_cache=False)
+                i = Image.open(io.BytesIO(content))
+                i = ImageOps.exif_transpose(i) # Handle orientation
+
+                if not keep_alpha_channel:
+                    i = i.convert("RGB")
+                else:
+                    i = i.convert("RGBA")
+
+                # Handle resizing to match batch
+                if len(images) == 0:
+                    first_width = i.width
+                    first_height = i.height
                 else:
-                    print(f"[DownloadImagesFromUrls] Failed to download {url}: Status {response.status_code}")
+                    if i.width != first_width or i.height != first_height:
+                        # Resize to match the first image
+                        i = i.resize((first_width, first_height), Image.LANCZOS)
+
+                image = np.array(i).astype(np.float32) / 255.0
+                image = torch.from_numpy(image)[None,]
+                images.append(image)
             except Exception as e:
                 print(f"[DownloadImagesFromUrls] Error downloading {url}: {e}")
 
@@ -0,0 +1,146 @@
+"""后台文件写入队列：原子写入（临时文件 + os.replace）、可选 gzip 压缩与 fsync 策略。
+
+SaveSVG 等节点把写盘工作交给后台线程，执行线程只负责排队，不再被大量小文件阻塞。
+"""
+import gzip
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import Future
+
+# fsync 策略：none 不同步；file 同步文件内容；file+dir 额外同步所在目录（保证重命名落盘）
+FSYNC_POLICIES = ["none", "file", "file+dir"]
+
+# 队列容量，写入速度跟不上时 submit 会阻塞，避免待写数据无限堆积
+WRITER_QUEUE_SIZE = 1024
+WRITER_THREADS = 2
+# 同一路径的写入按路径哈希分到这些锁上串行执行，保证覆盖写入时最后排队的内容生效
+WRITER_PATH_LOCKS = 64
+
+# 路径 -> 尚未写完的排队写入数
+_reserved = {}
+# 每个 (目录, 文件名主干, 扩展名) 下次尝试的序号，避免同名反复保存时从头探测
+_next_counter = {}
+_reserve_lock = threading.Lock()
+
+
+def reserve_path(directory, stem, ext, overwrite=False):
+    """返回 directory 下不与现有文件或尚未写完的排队文件冲突的路径（stem + ext，必要时追加 _序号）。
+
+    overwrite=True 时总是返回 stem + ext，由写入覆盖同名文件（仍是原子替换）。
+    """
+    key = (os.path.abspath(directory), stem, ext)
+    with _reserve_lock:
+        if overwrite:
+            path = os.path.join(directory, f"{stem}{ext}")
+            _reserved[path] = _reserved.get(path, 0) + 1
+            return path
+        counter = _next_counter.get(key, 0)
+        while True:
+            name = f"{stem}{ext}" if counter == 0 else f"{stem}_{counter}{ext}"
+            path = os.path.join(directory, name)
+            if path not in _reserved and not os.path.exists(path):
+                _reserved[path] = 1
+                _next_counter[key] = counter + 1
+                return path
+            counter += 1
+
+
+def _release(path):
+    with _reserve_lock:
+        count = _reserved.pop(path, 0) - 1
+        if count > 0:
+            _reserved[path] = count
+
+
+def write_atomic(path, data, compress=False, fsync_policy="none", compresslevel=6):
+    """把 data（str 按 utf-8 编码）写入 path；先写同目录临时文件，再 os.replace 原子替换。"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if compress:
+        data = gzip.compress(data, compresslevel=compresslevel)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            if fsync_policy != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if fsync_policy == "file+dir" and hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return path
+
+
+class BackgroundWriter:
+    def __init__(self, threads=WRITER_THREADS, maxsize=WRITER_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        # path -> 该路径最近一次排队写入的 Future
+        self._latest = {}
+        self._latest_lock = threading.Lock()
+        self._path_locks = [threading.Lock() for _ in range(WRITER_PATH_LOCKS)]
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"koi-file-writer-{i}", daemon=True)
+            for i in range(threads)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _worker(self):
+        while True:
+            path, data, options, future = self._queue.get()
+            try:
+                with self._path_locks[hash(path) % len(self._path_locks)]:
+                    with self._latest_lock:
+                        superseded = self._latest.get(path) is not future
+                    # 同一路径之后又排队了新内容时跳过本次写入，避免旧内容后写完覆盖新内容
+                    future.set_result(path if superseded else write_atomic(path, data, **options))
+            except Exception as e:
+                print(f"[FileWriter] Failed to write {path}: {e}")
+                future.set_exception(e)
+            finally:
+                with self._latest_lock:
+                    if self._latest.get(path) is future:
+                        del self._latest[path]
+                _release(path)
+                self._queue.task_done()
+
+    def submit(self, path, data, compress=False, fsync_policy="none"):
+        """排队写入，返回 Future（结果为写入的路径）。"""
+        future = Future()
+        with self._latest_lock:
+            self._latest[path] = future
+        self._queue.put((path, data, {"compress": compress, "fsync_policy": fsync_policy}, future))
+        return future
+
+    def flush(self):
+        """阻塞直到当前已排队的写入全部完成。"""
+        self._queue.join()
+
+    @property
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BackgroundWriter()
+        return _writer
@@ -1,7 +1,65 @@
-import requests
-import json
-import time
+import math
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from .download_url import get_session
+
+
+class _QueryCache:
+    """Thread-safe TTL cache of query -> (icons, data), with hit/miss counters."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(accept_language, params):
+        return (accept_language, tuple(sorted((k, str(v)) for k, v in params.items())))
+
+    def get(self, key, count=True):
+        """Return the cached value or None; count=False leaves the hit/miss counters untouched."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                if count:
+                    self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            if count:
+                self.misses += 1
+            return None
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                # Drop expired entries first, then the oldest-expiring ones
+                self.entries = {k: v for k, v in self.entries.items() if v[0] > now}
+                for k in sorted(self.entries, key=lambda k: self.entries[k][0])[:len(self.entries) - self.max_entries + 1]:
+                    del self.entries[k]
+            self.entries[key] = (now + ttl, value)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.entries),
+            }
+
+
+_query_cache = _QueryCache()
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="koi-freepik-prefetch")
+
 
 class FreepikIconSearch:
     def __init__(self):
@@ -25,16 +83,157 @@ class FreepikIconSearch:
                 "enable_random_selection": ("BOOLEAN", {"default": False}),
                 "selection_count": ("INT", {"default": 1, "min": 1, "max": 100}),
             },
+            "optional": {
+                "relaxation_mode": (["sequential", "parallel"], {"default": "sequential"}),
+                "timeout": ("FLOAT", {"default": 15.0, "min": 1.0, "max": 120.0, "step": 1.0}),
+                "cache_ttl_minutes": ("FLOAT", {"default": 60.0, "min": 0.0, "max": 10080.0, "step": 1.0}),
+            },
         }
 
-    RETURN_TYPES = ("JSON", "JSON")
-    RETURN_NAMES = ("icon_urls", "raw_json")
+    RETURN_TYPES = ("JSON", "JSON", "JSON")
+    RETURN_NAMES = ("icon_urls", "raw_json", "cache_stats")
     FUNCTION = "search_icons"
     CATEGORY = "🐟Koi-Toolkit"
 
-    def search_icons(self, api_key, accept_language, term, page, per_page, thumbnail_size, icon_type, color, shape, period, order, enable_random_selection, selection_count):
-        base_url = "https://api.freepik.com/v1/icons"
-        
+    BASE_URL = "https://api.freepik.com/v1/icons"
+
+    # Priority of relaxation (drop order)
+    KEYS_TO_DROP_PRIORITY = [
+        "order",
+        "filters[period]",
+        "filters[color]",
+        "filters[shape]",
+        "filters[icon_type][]"
+    ]
+
+    def _fetch(self, session, headers, params, timeout):
+        """Issue one search request. Returns (icons, data); data is None unless the API returned 200.
+
+        "No icons found" (404) and invalid filter combinations (400) count as empty results so the
+        relaxation logic can continue; any other error is raised.
+        """
+        response = session.get(self.BASE_URL, headers=headers, params=params, timeout=timeout)
+
+        extracted_icons = []
+        data = None
+
+        if response.status_code == 200:
+            data = response.json()
+            if "data" in data:
+                for item in data["data"]:
+                    if "thumbnails" in item and len(item["thumbnails"]) > 0:
+                        extracted_icons.append(item["thumbnails"][0]["url"])
+        elif response.status_code == 404:
+            # Freepik API returns 404 when no icons are found, handle this gracefully
+            try:
+                error_data = response.json()
+            except ValueError:
+                error_data = {}
+            if error_data.get("message") != "No icons found":
+                # Real 404 error
+                print(f"Response content: {response.text}")
+                response.raise_for_status()
+        elif response.status_code == 400:
+            # Handle 400 Bad Request (often invalid parameter combinations)
+            try:
+                error_data = response.json()
+            except ValueError:
+                print(f"Response content: {response.text}")
+                response.raise_for_status()
+            print(f"Freepik Icon Search: API returned 400 Bad Request. Message: {error_data.get('message')}")
+        else:
+            print(f"Response content: {response.text}")
+            response.raise_for_status()
+
+        return extracted_icons, data
+
+    def _cached_fetch(self, session, headers, params, timeout, ttl, prefetch=False):
+        """_fetch through the TTL query cache; errors are never cached. ttl <= 0 bypasses the cache.
+
+        prefetch=True is for background warm-up: it does nothing when the cache is off or already holds
+        the page, and is not counted in the cache statistics.
+        """
+        if ttl <= 0:
+            return None if prefetch else self._fetch(session, headers, params, timeout)
+        key = _QueryCache.make_key(headers.get("Accept-Language"), params)
+        cached = _query_cache.get(key, count=not prefetch)
+        if cached is not None:
+            return cached
+        result = self._fetch(session, headers, params, timeout)
+        _query_cache.set(key, result, ttl)
+        return result
+
+    def _collect_pages(self, fetch, params, base_params, icons, selection_count):
+        """Fetch the extra pages random selection needs to have selection_count candidates.
+
+        The pages needed now are requested concurrently; the page after them is prefetched in the
+        background so the next run (or a re-roll) is served from the cache. A page that fails (e.g. 429)
+        is skipped, so the candidates already collected are still returned.
+        """
+        per_page = base_params.get("per_page") or len(icons)
+        if per_page <= 0 or len(icons) < per_page:
+            # The first page was not full, so there are no further pages
+            return icons
+        page = base_params.get("page") or 1
+        extra_pages = max(0, math.ceil(selection_count / per_page) - 1)
+
+        page_params = [{**params, **base_params, "page": page + i} for i in range(1, extra_pages + 1)]
+        _prefetch_pool.submit(fetch, {**params, **base_params, "page": page + extra_pages + 1}, prefetch=True)
+        if not page_params:
+            return icons
+
+        candidates = list(icons)
+        futures = [_prefetch_pool.submit(fetch, p) for p in page_params]
+        for p, future in zip(page_params, futures):
+            try:
+                page_icons, _ = future.result()
+            except Exception as e:
+                print(f"Freepik Icon Search: Failed to fetch page {p['page']}, using {len(candidates)} candidates so far: {e}")
+                continue
+            candidates.extend(page_icons)
+        return candidates
+
+    def _relaxation_ladder(self, current_params):
+        """All parameter sets the relaxation would try, from the strictest to the most relaxed."""
+        ladder = [dict(current_params)]
+        params = dict(current_params)
+        for key in self.KEYS_TO_DROP_PRIORITY:
+            if key in params:
+                del params[key]
+                ladder.append(dict(params))
+        return ladder
+
+    def _search_sequential(self, fetch, ladder, base_params):
+        last_data = {}
+        for params in ladder:
+            icons, data = fetch({**params, **base_params})
+            if data is not None:
+                last_data = data
+            if icons:
+                return icons, data, params, last_data
+            print(f"Freepik Icon Search: No icons found with params {params}. Relaxing...")
+        return [], {}, None, last_data
+
+    def _search_parallel(self, fetch, ladder, base_params):
+        # Speculatively issue every rung at once, then take the least-relaxed one that has results
+        executor = ThreadPoolExecutor(max_workers=len(ladder))
+        futures = [executor.submit(fetch, {**params, **base_params}) for params in ladder]
+        last_data = {}
+        try:
+            for params, future in zip(ladder, futures):
+                icons, data = future.result()
+                if data is not None:
+                    last_data = data
+                if icons:
+                    return icons, data, params, last_data
+                print(f"Freepik Icon Search: No icons found with params {params}.")
+        finally:
+            # Don't wait for the more relaxed queries still in flight
+            executor.shutdown(wait=False, cancel_futures=True)
+        return [], {}, None, last_data
+
+    def search_icons(self, api_key, accept_language, term, page, per_page, thumbnail_size, icon_type, color, shape, period, order, enable_random_selection, selection_count,
+                     relaxation_mode="sequential", timeout=15.0, cache_ttl_minutes=60.0):
         headers = {
             "Accept-Language": accept_language,
             "x-freepik-api-key": api_key
@@ -60,99 +259,32 @@ class FreepikIconSearch:
             base_params["per_page"] = per_page
         if thumbnail_size > 0:
             base_params["thumbnail_size"] = thumbnail_size
-            
-        # Priority of relaxation (drop order)
-        keys_to_drop_priority = [
-            "order",
-            "filters[period]",
-            "filters[color]",
-            "filters[shape]",
-            "filters[icon_type][]"
-        ]
-        
-        last_data = {}
-        
-        while True:
-            # Merge current variable params with base params
-            request_params = {**current_params, **base_params}
-            
-            try:
-                response = requests.get(base_url, headers=headers, params=request_params)
-                
-                extracted_icons = []
-                data = {}
 
-                if response.status_code == 200:
-                    data = response.json()
-                    last_data = data
-                    if "data" in data:
-                        for item in data["data"]:
-                            if "thumbnails" in item and len(item["thumbnails"]) > 0:
-                                extracted_icons.append(item["thumbnails"][0]["url"])
-                elif response.status_code == 404:
-                    # Freepik API returns 404 when no icons are found, handle this gracefully
-                    try:
-                        error_data = response.json()
-                        if error_data.get("message") == "No icons found":
-                            # Treat as empty results and continue to relaxation logic
-                            pass
-                        else:
-                            # Real 404 error
-                            response.raise_for_status()
-                    except:
-                        response.raise_for_status()
-                elif response.status_code == 400:
-                    # Handle 400 Bad Request (often invalid parameter combinations)
-                    try:
-                        error_data = response.json()
-                        print(f"Freepik Icon Search: API returned 400 Bad Request. Message: {error_data.get('message')}")
-                        # Treat as failure and continue to relaxation logic
-                        pass
-                    except:
-                        response.raise_for_status()
-                else:
-                    response.raise_for_status()
-                
-                if extracted_icons:
-                    print(f"Freepik Icon Search: Found {len(extracted_icons)} icons. Params: {current_params}")
-                    
-                    if enable_random_selection and len(extracted_icons) > selection_count:
-                        extracted_icons = random.sample(extracted_icons, selection_count)
-                        print(f"Freepik Icon Search: Randomly selected {len(extracted_icons)} icons.")
-
-                    return (extracted_icons, data)
-                
-                # If return value is empty (no icons found), automatically execute relaxation steps
-                print(f"Freepik Icon Search: No icons found with params {current_params}. Starting relaxation process...")
-                
-                key_dropped = False
-                for key in keys_to_drop_priority:
-                    # If the parameter exists in current_params, drop it and retry.
-                    if key in current_params:
-                        del current_params[key]
-                        print(f"Freepik Icon Search: Dropped parameter '{key}'. Retrying search...")
-                        key_dropped = True
-                        break
-                    else:
-                        # Debug log to show we are skipping keys that don't exist
-                        # print(f"Freepik Icon Search: Parameter '{key}' not active, skipping.")
-                        pass
-                
-                if not key_dropped:
-                    # No more keys to drop, and still no results
-                    print("Freepik Icon Search: No icons found even after relaxing all conditions.")
-                    return ([], last_data)
-                
-                if not key_dropped:
-                    # No more keys to drop, and still no results
-                    print("Freepik Icon Search: No icons found even after relaxing all conditions.")
-                    return ([], last_data)
-                    
-            except Exception as e:
-                print(f"Error searching icons: {e}")
-                if 'response' in locals():
-                    print(f"Response content: {response.text}")
-                return ([], {})
+        ladder = self._relaxation_ladder(current_params)
+        fetch = partial(self._cached_fetch, get_session(), headers, timeout=timeout, ttl=cache_ttl_minutes * 60.0)
+
+        try:
+            if relaxation_mode == "parallel":
+                icons, data, params, last_data = self._search_parallel(fetch, ladder, base_params)
+            else:
+                icons, data, params, last_data = self._search_sequential(fetch, ladder, base_params)
+            if icons and enable_random_selection and len(icons) < selection_count:
+                icons = self._collect_pages(fetch, params, base_params, icons, selection_count)
+        except Exception as e:
+            print(f"Error searching icons: {e}")
+            return ([], {}, _query_cache.stats())
+
+        if not icons:
+            print("Freepik Icon Search: No icons found even after relaxing all conditions.")
+            return ([], last_data, _query_cache.stats())
+
+        print(f"Freepik Icon Search: Found {len(icons)} icons. Params: {params}")
+
+        if enable_random_selection and len(icons) > selection_count:
+            icons = random.sample(icons, selection_count)
+            print(f"Freepik Icon Search: Randomly selected {len(icons)} icons.")
+
+        return (icons, data, _query_cache.stats())
 
 NODE_CLASS_MAPPINGS = {
     "FreepikIconSearch": FreepikIconSearch
@@ -1,4 +1,3 @@
-import requests
 import json
 import torch
 import numpy as np
@@ -6,6 +5,10 @@ from PIL import Image
 import io
 import base64
 import re
+from .image_encoder import encode_images, IMAGE_FORMATS
+from .download_url import fetch_url_bytes
+from .llm_request_engine import get_engine, RequestEngineError
+from .llm_response_cache import get_response_cache, make_cache_key
 
 class IdealabAPINode:
     @classmethod
@@ -21,15 +24,25 @@ class IdealabAPINode:
             "optional": {
                 "image": ("IMAGE",),
                 "image2": ("IMAGE",),
+                "timeout": ("FLOAT", {"default": 90.0, "min": 5.0, "max": 600.0, "step": 5.0}),
+                "max_retries": ("INT", {"default": 4, "min": 0, "max": 10}),
+                "use_cache": ("BOOLEAN", {"default": False}),
+                "cache_ttl_hours": ("FLOAT", {"default": 24.0, "min": 0.0, "max": 8760.0, "step": 1.0}),
+                "image_max_side": ("INT", {"default": 0, "min": 0, "max": 8192, "step": 64}),
+                "image_format": (IMAGE_FORMATS, {"default": "JPEG"}),
+                "image_quality": ("INT", {"default": 75, "min": 1, "max": 100}),
+                "send_all_frames": ("BOOLEAN", {"default": False}),
             }
         }
 
-    RETURN_TYPES = ("STRING", "IMAGE")
-    RETURN_NAMES = ("response", "image")
+    RETURN_TYPES = ("STRING", "IMAGE", "BOOLEAN")
+    RETURN_NAMES = ("response", "image", "cache_hit")
     FUNCTION = "chat"
     CATEGORY = "🐟Koi-Toolkit"
 
-    def chat(self, api_key, system_prompt, user_prompt, model, temperature, image=None, image2=None):
+    def chat(self, api_key, system_prompt, user_prompt, model, temperature, image=None, image2=None,
+             timeout=90.0, max_retries=4, use_cache=False, cache_ttl_hours=24.0,
+             image_max_side=0, image_format="JPEG", image_quality=75, send_all_frames=False):
         url = "https://idealab.alibaba-inc.com/api/openai/v1/chat/completions"
         
         headers = {
@@ -54,26 +67,25 @@ class IdealabAPINode:
                 }
             ]
             
+            # Take the first image of each batch, or every frame when send_all_frames is set
+            frames = []
             for img_batch in images:
-                try:
-                    # Take the first image in the batch
-                    img_tensor = img_batch[0]
-                    i = 255. * img_tensor.cpu().numpy()
-                    img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-                    
-                    buffered = io.BytesIO()
-                    img.save(buffered, format="JPEG")
-                    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-                    base64_image = f"data:image/jpeg;base64,{img_str}"
-                    
-                    user_content.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": base64_image
-                        }
-                    })
-                except Exception as e:
-                    raise RuntimeError(f"Error processing image: {str(e)}")
+                frames.extend(img_batch if send_all_frames else img_batch[:1])
+
+            try:
+                encoded = encode_images(frames, image_max_side, image_format, image_quality)
+            except Exception as e:
+                raise RuntimeError(f"Error processing image: {str(e)}")
+
+            total_bytes = sum(n for _, n in encoded)
+            print(f"[IdealabAPINode] {len(encoded)} image(s), payload: {total_bytes / 1024:.1f} KB ({image_format}, max_side={image_max_side})")
+            for base64_image, _ in encoded:
+                user_content.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": base64_image
+                    }
+                })
 
         messages = [
             {
@@ -95,10 +107,16 @@ class IdealabAPINode:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=90)
-            response.raise_for_status()
-            
-            result = response.json()
+            cache_key = make_cache_key(url, payload) if use_cache else None
+            result = get_response_cache().get(cache_key) if cache_key else None
+            cache_hit = result is not None
+            if not cache_hit:
+                result = get_engine().request_json_sync(
+                    "POST", url, base_url=url, api_key=api_key, headers=headers, json=payload,
+                    timeout=float(timeout), max_retries=int(max_retries),
+                )
+                if cache_key and cache_ttl_hours > 0:
+                    get_response_cache().set(cache_key, result, cache_ttl_hours * 3600.0)
             
             # Try to extract content from standard OpenAI format
             # Usually: choices[0].message.content
@@ -150,9 +168,7 @@ class IdealabAPINode:
                     
                     img = None
                     if img_url.startswith("http"):
-                        img_response = requests.get(img_url, timeout=30)
-                        img_response.raise_for_status()
-                        img = Image.open(io.BytesIO(img_response.content))
+                        img = Image.open(io.BytesIO(fetch_url_bytes(img_url, timeout=30, use_cache=True)))
                     elif img_url.startswith("data:image/"):
                         # Handle data URI
                         base64_data = img_url.split(",")[1]
@@ -173,13 +189,13 @@ class IdealabAPINode:
             except Exception as e:
                 print(f"Error processing output image: {str(e)}")
                 
-            return (content, output_image)
+            return (content, output_image, cache_hit)
 
-        except requests.exceptions.RequestException as e:
+        except RequestEngineError as e:
             error_msg = f"API Request Failed: {str(e)}"
-            if hasattr(e, 'response') and e.response is not None:
-                error_msg += f"\nStatus Code: {e.response.status_code}"
-                error_msg += f"\nResponse: {e.response.text}"
+            if e.status_code is not None:
+                error_msg += f"\nStatus Code: {e.status_code}"
+                error_msg += f"\nResponse: {e.body}"
             raise RuntimeError(error_msg)
         except Exception as e:
             raise RuntimeError(f"An error occurred: {str(e)}")
@@ -1,4 +1,72 @@
 import torch
+import torch.nn.functional as F
+
+# 边缘检测与平滑的卷积核，按 (设备, dtype) 缓存，避免每次调用重新构建并拷贝到设备
+_kernel_cache = {}
+
+# 分块时每块向外扩展的像素数：软掩码模糊 1 像素 + Sobel/平滑 1 像素
+TILE_HALO = 2
+
+
+def _get_kernels(device, dtype):
+    """返回 (3x3 高斯核 [1,1,3,3], 堆叠的 Sobel-x / Sobel-y / 高斯核 [3,1,3,3])。"""
+    key = (str(device), dtype)
+    kernels = _kernel_cache.get(key)
+    if kernels is None:
+        gauss = torch.tensor([[1., 2., 1.], [2., 4., 2.], [1., 2., 1.]]) / 16.0
+        sobel_x = torch.tensor([[-1., 0., 1.], [-2., 0., 2.], [-1., 0., 1.]])
+        sobel_y = torch.tensor([[-1., -2., -1.], [0., 0., 0.], [1., 2., 1.]])
+        stacked = torch.stack([sobel_x, sobel_y, gauss]).unsqueeze(1)
+        kernels = (gauss.view(1, 1, 3, 3).to(device=device, dtype=dtype), stacked.to(device=device, dtype=dtype))
+        _kernel_cache[key] = kernels
+    return kernels
+
+
+def _color_diff(image):
+    return image.amax(dim=-1) - image.amin(dim=-1)
+
+
+def _desaturate_edges(image, color_diff_threshold, denom, gauss, stacked):
+    """融合的主计算：image [B,h,w,3] -> (去色灰度, Sobel 梯度幅值, 3x3 平滑灰度)，均为 [B,h,w]。
+
+    只用张量运算、不含 Python 分支，便于 torch.compile / jit。
+    去色图 desat = image*(1-s) + (image+(1-image)*n)*s = image + (1-image)*n*s，
+    亮度权重之和为 1，因此其亮度可直接由原图亮度得到：L + (1-L)*n*s，无需生成 3 通道中间图。
+    """
+    color_diff = _color_diff(image)
+    colored_mask = (color_diff > color_diff_threshold).to(image.dtype)
+    # 渐进白化强度：颜色差越大越接近纯白
+    norm_diff = ((color_diff - color_diff_threshold).clamp(min=0.0) / denom).clamp(0.0, 1.0)
+    # 软边缘掩码（对二值彩色区域做小模糊），幂次<1略扩展白域
+    soft_mask = F.conv2d(colored_mask.unsqueeze(1), gauss, padding=1).squeeze(1).clamp(0.0, 1.0) ** 0.7
+
+    luminance = 0.299 * image[..., 0] + 0.587 * image[..., 1] + 0.114 * image[..., 2]
+    desat_gray = luminance + (1.0 - luminance) * (norm_diff * soft_mask)
+
+    # 一次卷积同时得到 Sobel-x、Sobel-y 与平滑结果
+    out = F.conv2d(desat_gray.unsqueeze(1), stacked, padding=1)
+    grad = torch.sqrt(out[:, 0] * out[:, 0] + out[:, 1] * out[:, 1])
+    # 复制出平滑通道，使 3 通道卷积结果可以随函数返回释放
+    return desat_gray, grad, out[:, 2].clone()
+
+
+def _batched_histogram(x, bins=256):
+    """x: [B,...] -> [B,bins] 逐张直方图，分箱方式与 torch.histc(bins, 0, 1) 相同（区间外的值不计入）。
+
+    用一次 bincount（各图的箱号加上偏移）完成整批统计，区间外的值落入每张图额外的一个丢弃箱。
+    """
+    batch_size = x.shape[0]
+    x = x.reshape(batch_size, -1).float()
+    idx = (x * bins).long().clamp_(0, bins - 1)
+    idx = torch.where((x >= 0) & (x <= 1), idx, bins)
+    idx += torch.arange(batch_size, device=x.device).unsqueeze(1) * (bins + 1)
+    hist = torch.bincount(idx.reshape(-1), minlength=batch_size * (bins + 1))
+    return hist.view(batch_size, bins + 1)[:, :bins].float()
+
+
+def _ranges(length, step):
+    return [(start, min(length, start + step)) for start in range(0, length, step)]
+
 
 class ImageDesaturateEdgeBinarize:
     """将彩色像素去色为灰度，并进行边缘保护的自适应二值化。
@@ -19,6 +87,13 @@ class ImageDesaturateEdgeBinarize:
                 "color_diff_threshold": ("FLOAT", {"default": 0.02, "min": 0.0, "max": 1.0, "step": 0.001}),
                 "edge_threshold": ("FLOAT", {"default": 0.2, "min": 0.0, "max": 1.0, "step": 0.01}),
                 "override_threshold": ("FLOAT", {"default": -1.0, "min": -1.0, "max": 1.0, "step": 0.001}),
+            },
+            "optional": {
+                # 分块边长，0 表示整图一次计算；超大图（如 8K 扫描件）可分块以控制峰值内存
+                "tile_size": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 64}),
+                # batch：颜色差/梯度最大值与 Otsu 直方图按整批统计（原行为）；
+                # per_image：逐张统计，结果与单张处理完全一致，可任意拆分批次
+                "statistics_scope": (["batch", "per_image"], {"default": "batch"}),
             }
         }
 
@@ -27,99 +102,94 @@ class ImageDesaturateEdgeBinarize:
     FUNCTION = "process"
     CATEGORY = "🐟Koi-Toolkit"
 
-    def _luminance(self, img):
-        return 0.299 * img[..., 0] + 0.587 * img[..., 1] + 0.114 * img[..., 2]
-
-    def _gaussian_blur3(self, gray):
-        # gray: [B,H,W]
-        kernel = torch.tensor([[1., 2., 1.], [2., 4., 2.], [1., 2., 1.]], device=gray.device) / 16.0
-        k = kernel.view(1, 1, 3, 3)
-        inp = gray.unsqueeze(1)
-        out = torch.nn.functional.conv2d(inp, k, padding=1)
-        return out.squeeze(1)
-
-    def _sobel_edges(self, gray):
-        sobel_x = torch.tensor([[-1., 0., 1.], [-2., 0., 2.], [-1., 0., 1.]], device=gray.device)
-        sobel_y = torch.tensor([[-1., -2., -1.], [0., 0., 0.], [1., 2., 1.]], device=gray.device)
-        kx = sobel_x.view(1, 1, 3, 3)
-        ky = sobel_y.view(1, 1, 3, 3)
-        inp = gray.unsqueeze(1)
-        gx = torch.nn.functional.conv2d(inp, kx, padding=1)
-        gy = torch.nn.functional.conv2d(inp, ky, padding=1)
-        grad = torch.sqrt(gx * gx + gy * gy).squeeze(1)
-        # 归一化
-        maxv = grad.max()
-        if maxv > 0:
-            grad = grad / maxv
-        return grad
-
-    def _otsu_threshold(self, gray):
-        # gray: [B,H,W] -> flatten
-        flat = gray.reshape(-1)
-        # 避免空张量
-        if flat.numel() == 0:
-            return 0.5
-        hist = torch.histc(flat, bins=256, min=0.0, max=1.0)
-        total = float(flat.numel())
+    def _otsu_from_hist(self, hist, total):
+        # hist: [..., 256] 直方图（可带批次维）, total: 每个直方图的像素总数
+        # 返回各直方图的阈值张量 [...]
         p = hist / (total + 1e-12)
-        bin_centers = torch.linspace(0, 1, steps=256, device=gray.device)
-        w1 = torch.cumsum(p, dim=0)
+        bin_centers = torch.linspace(0, 1, steps=256, device=hist.device)
+        w1 = torch.cumsum(p, dim=-1)
         w2 = 1 - w1
-        cumsum_mu = torch.cumsum(p * bin_centers, dim=0)
+        cumsum_mu = torch.cumsum(p * bin_centers, dim=-1)
         mean1 = cumsum_mu / (w1 + 1e-12)
-        mean_total = cumsum_mu[-1]
+        mean_total = cumsum_mu[..., -1:]
         mean2 = (mean_total - cumsum_mu) / (w2 + 1e-12)
         sigma = w1 * w2 * (mean1 - mean2) ** 2
-        idx = torch.argmax(sigma)
-        return bin_centers[idx].item()
-
-    def process(self, image, color_diff_threshold=0.02, edge_threshold=0.2, override_threshold=-1.0):
+        idx = torch.argmax(sigma, dim=-1)
+        return bin_centers[idx]
+
+    def _desaturate_tiled(self, image, rows, cols, color_diff_threshold, denom, gauss, stacked):
+        """分块执行 _desaturate_edges，结果写入预分配的整图缓冲区；中间结果的峰值内存只与块大小有关。"""
+        batch_size, height, width = image.shape[:3]
+        desat_gray = torch.empty((batch_size, height, width), dtype=image.dtype, device=image.device)
+        edges = torch.empty_like(desat_gray)
+        work = torch.empty_like(desat_gray)
+        for y0, y1 in rows:
+            for x0, x1 in cols:
+                ey0, ex0 = max(0, y0 - TILE_HALO), max(0, x0 - TILE_HALO)
+                ey1, ex1 = min(height, y1 + TILE_HALO), min(width, x1 + TILE_HALO)
+                gray_t, grad_t, blur_t = _desaturate_edges(image[:, ey0:ey1, ex0:ex1], color_diff_threshold, denom, gauss, stacked)
+                core = (slice(None), slice(y0 - ey0, y1 - ey0), slice(x0 - ex0, x1 - ex0))
+                desat_gray[:, y0:y1, x0:x1] = gray_t[core]
+                edges[:, y0:y1, x0:x1] = grad_t[core]
+                work[:, y0:y1, x0:x1] = blur_t[core]
+        return desat_gray, edges, work
+
+    def process(self, image, color_diff_threshold=0.02, edge_threshold=0.2, override_threshold=-1.0, tile_size=0,
+                statistics_scope="batch"):
         # image: [B,H,W,3], 0-1 float
-        # Step 1: 灰度 & 仅对非灰度像素去色
-        luminance = self._luminance(image)
-        max_c, _ = image.max(dim=-1)
-        min_c, _ = image.min(dim=-1)
-        color_diff = max_c - min_c
-        colored_mask = (color_diff > color_diff_threshold).float()  # [B,H,W]
-        colored_mask3 = colored_mask.unsqueeze(-1)
-        gray3 = luminance.unsqueeze(-1).repeat(1, 1, 1, 3)  # 保留原灰度变量（结构不动）
-        # 为避免彩色/非彩色交界产生锯齿：
-        # 1) 计算颜色差的连续强度并用于渐进白化
-        # 2) 对二值彩色掩码做轻度高斯模糊形成软边缘混合
-        # 渐进白化：颜色差越大越接近纯白，边缘区仍保留一定原色以抗锯齿
-        denom = torch.clamp(color_diff.max() - color_diff_threshold, min=1e-6)
-        norm_diff = (color_diff - color_diff_threshold).clamp(min=0.0) / denom
-        norm_diff = norm_diff.clamp(0.0, 1.0)  # [B,H,W]
-        progressive_white = image + (1.0 - image) * norm_diff.unsqueeze(-1)  # 渐进向白
-
-        # 软边缘掩码（对二值彩色区域做小模糊），加强过渡减少锯齿
-        soft_mask = self._gaussian_blur3(colored_mask)
-        soft_mask = soft_mask.clamp(0.0, 1.0) ** 0.7  # 轻微增强内部（幂次<1略扩展白域）
-        soft_mask3 = soft_mask.unsqueeze(-1)
-
-        # 最终混合：原图与渐进白图按软掩码过渡
-        desat = image * (1 - soft_mask3) + progressive_white * soft_mask3
-
-        # Step 2: 边缘检测
-        desat_gray = self._luminance(desat)
-        grad_norm = self._sobel_edges(desat_gray)
-        edge_mask = (grad_norm >= edge_threshold).float()  # [B,H,W]
-
-        # Step 3: 平滑 + 边缘保护
-        blurred = self._gaussian_blur3(desat_gray)
-        adaptive_gray = desat_gray * edge_mask + blurred * (1 - edge_mask)
+        batch_size, height, width = image.shape[:3]
+        gauss, stacked = _get_kernels(image.device, image.dtype)
+        step = tile_size if tile_size > 0 else max(height, width, 1)
+        rows, cols = _ranges(height, step), _ranges(width, step)
+
+        per_image = statistics_scope == "per_image"
+
+        # 逐张统计时最大值形状为 [B,1,1]，整批统计时为标量，二者都可直接广播
+        def batch_max(x):
+            return x.amax(dim=(1, 2), keepdim=True) if per_image else x.max()
+
+        # 第一遍：颜色差的最大值，决定渐进白化的归一化分母
+        color_max = torch.stack([batch_max(_color_diff(image[:, y0:y1, x0:x1])) for y0, y1 in rows for x0, x1 in cols]).amax(dim=0)
+        denom = torch.clamp(color_max - color_diff_threshold, min=1e-6)
+
+        # Step 1-2: 去色、Sobel 梯度与平滑（分块时每块带 TILE_HALO 像素的重叠区）
+        # 三个单通道缓冲区贯穿全流程：灰度；梯度 -> 边缘掩码；平滑灰度 -> 自适应灰度 -> 二值图
+        if len(rows) * len(cols) == 1:
+            desat_gray, edges, work = _desaturate_edges(image, color_diff_threshold, denom, gauss, stacked)
+        else:
+            desat_gray, edges, work = self._desaturate_tiled(image, rows, cols, color_diff_threshold, denom, gauss, stacked)
+
+        # Step 3: 边缘掩码 + 边缘保护的平滑，按行带原地完成
+        # grad / max >= t 等价于 grad >= t * max；max 为 0 时梯度全为 0，与阈值直接比较
+        grad_max = batch_max(edges)
+        edge_cut = torch.where(grad_max > 0, edge_threshold * grad_max, torch.full_like(grad_max, edge_threshold))
+        hist = torch.zeros((batch_size, 256) if per_image else 256, dtype=torch.float32, device=image.device)
+        compute_otsu = not override_threshold > 0
+        for y0, y1 in rows:
+            edge_band = edges[:, y0:y1] >= edge_cut
+            edges[:, y0:y1] = edge_band
+            work[:, y0:y1] = torch.where(edge_band, desat_gray[:, y0:y1], work[:, y0:y1])
+            if compute_otsu and per_image:
+                hist += _batched_histogram(work[:, y0:y1])
+            elif compute_otsu:
+                hist += torch.histc(work[:, y0:y1].float(), bins=256, min=0.0, max=1.0)
 
         # Step 4: 阈值 (Otsu 或覆盖)
-        if override_threshold > 0:
+        if not compute_otsu:
             thr = override_threshold
+        elif work.numel() == 0:
+            thr = 0.5
+        elif per_image:
+            thr = self._otsu_from_hist(hist, float(height * width)).view(-1, 1, 1).to(work.dtype)
         else:
-            thr = self._otsu_threshold(adaptive_gray)
-        bin_mask = (adaptive_gray >= thr).float()  # [B,H,W]
-
-        # 输出格式: 灰度与二值化均为 3 通道 IMAGE
-        gray_img = desat_gray.unsqueeze(-1).repeat(1, 1, 1, 3)
-        bin_img = bin_mask.unsqueeze(-1).repeat(1, 1, 1, 3)
-        return (gray_img, bin_img, edge_mask)
+            thr = self._otsu_from_hist(hist, float(work.numel())).item()
+        for y0, y1 in rows:
+            work[:, y0:y1] = work[:, y0:y1] >= thr
+
+        # 输出格式: 灰度与二值化均为 3 通道 IMAGE（expand 视图，不复制数据）
+        gray_img = desat_gray.unsqueeze(-1).expand(-1, -1, -1, 3)
+        bin_img = work.unsqueeze(-1).expand(-1, -1, -1, 3)
+        return (gray_img, bin_img, edges)
 
 
 NODE_CLASS_MAPPINGS = {
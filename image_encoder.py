@@ -0,0 +1,89 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+
+# 已编码载荷的 LRU 容量（条目数）
+ENCODER_CACHE_SIZE = 64
+# 已编码载荷的总字节上限（按 data URI 长度计），超过单条上限的结果不缓存
+ENCODER_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+IMAGE_FORMATS = ["JPEG", "PNG", "WEBP"]
+
+_MIME = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="koi-image-encode")
+
+
+def _to_uint8(image):
+    """IMAGE 张量 ([B,]H,W,C, 0-1 float) -> HxWxC uint8 ndarray，取批次第一帧。"""
+    if image.dim() == 4:
+        image = image[0]
+    return (image.detach() * 255.0).clamp(0, 255).to(torch.uint8).cpu().numpy()
+
+
+def _cache_drop(key):
+    global _cache_bytes
+    data_uri, _ = _cache.pop(key)
+    _cache_bytes -= len(data_uri)
+
+
+def encode_image(image, max_side=0, fmt="JPEG", quality=75):
+    """将 IMAGE 张量编码为 data URI，返回 (data_uri, 字节数)。
+
+    以像素内容哈希 + 编码参数为键缓存结果，未变化的输入不会重复编码；
+    max_side > 0 时先按长边等比缩小。
+    """
+    global _cache_bytes
+    fmt = fmt.upper()
+    pixels = np.ascontiguousarray(_to_uint8(image))
+    digest = hashlib.blake2b(pixels.data, digest_size=16).hexdigest()
+    key = (digest, pixels.shape, int(max_side), fmt, int(quality))
+
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return hit
+
+    img = Image.fromarray(pixels.squeeze(-1) if pixels.shape[-1] == 1 else pixels)
+    if max_side > 0 and max(img.size) > max_side:
+        scale = max_side / float(max(img.size))
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS)
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    buffered = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buffered, format=fmt)
+    else:
+        img.save(buffered, format=fmt, quality=int(quality))
+    data_uri = f"data:{_MIME[fmt]};base64,{base64.b64encode(buffered.getvalue()).decode()}"
+    result = (data_uri, len(data_uri))
+
+    if len(data_uri) <= ENCODER_CACHE_MAX_BYTES:
+        with _cache_lock:
+            if key in _cache:
+                _cache_drop(key)
+            _cache[key] = result
+            _cache_bytes += len(data_uri)
+            while len(_cache) > ENCODER_CACHE_SIZE or _cache_bytes > ENCODER_CACHE_MAX_BYTES:
+                _cache_drop(next(iter(_cache)))
+    return result
+
+
+def encode_images(images, max_side=0, fmt="JPEG", quality=75):
+    """并行编码多张图像（每项为 [H,W,C] 或 [1,H,W,C]），按输入顺序返回 [(data_uri, 字节数), ...]。"""
+    if len(images) <= 1:
+        return [encode_image(img, max_side, fmt, quality) for img in images]
+    return list(_pool.map(lambda img: encode_image(img, max_side, fmt, quality), images))
@@ -1,5 +1,58 @@
 import torch
 import numpy as np
+from .tensor_filters import gaussian_blur, ssim_map, ms_ssim_map, ms_ssim_levels, tiled_map, SSIM_RADIUS, BLUR_METHODS
+
+OUTPUT_DTYPES = {"float32": torch.float32, "float16": torch.float16, "bfloat16": torch.bfloat16}
+NORMALIZE_SCOPES = ["batch", "per_image"]
+
+
+def _chunk_ranges(batch_size, chunk_size):
+    step = chunk_size if chunk_size > 0 else max(1, batch_size)
+    return [(start, min(batch_size, start + step)) for start in range(0, batch_size, step)]
+
+
+def _slice_b(image_b, start, end, batch_size, height, width):
+    """取出与 image_a[start:end] 对应的 image_b 块；批次为 1 时广播，尺寸不同则缩放到 image_a 的尺寸。"""
+    if image_b.shape[0] == batch_size:
+        image_b = image_b[start:end]
+    if image_b.shape[1:3] != (height, width):
+        image_b = torch.nn.functional.interpolate(
+            image_b.permute(0, 3, 1, 2), 
+            size=(height, width), 
+            mode='bilinear', 
+            align_corners=False
+        ).permute(0, 2, 3, 1)
+    return image_b
+
+
+def _normalize_per_image(diff):
+    """每张图各自做 min-max 归一化；常数图保持原值。"""
+    diff_min = diff.amin(dim=(1, 2), keepdim=True)
+    diff_range = diff.amax(dim=(1, 2), keepdim=True) - diff_min
+    valid = diff_range > 0
+    return (diff - torch.where(valid, diff_min, 0.0)) / torch.where(valid, diff_range, 1.0)
+
+
+class _BatchRange:
+    """跨块累计整批的最小/最大值（保持为张量，避免每块一次主机同步）。"""
+
+    def __init__(self):
+        self.low = None
+        self.high = None
+
+    def update(self, diff):
+        low, high = diff.min(), diff.max()
+        self.low = low if self.low is None else torch.minimum(self.low, low)
+        self.high = high if self.high is None else torch.maximum(self.high, high)
+
+    def apply_(self, out, ranges):
+        # 与原实现一致：仅当 max > min 时归一化
+        if self.low is None or not bool(self.high > self.low):
+            return
+        scale = self.high - self.low
+        for start, end in ranges:
+            out[start:end] = (out[start:end].float() - self.low) / scale
+
 
 class ImageSubtraction:
     
@@ -12,6 +65,13 @@ class ImageSubtraction:
                 "mode": (["absolute_diff", "signed_diff", "threshold_diff"], {"default": "absolute_diff"}),
                 "threshold": ("FLOAT", {"default": 0.1, "min": 0.0, "max": 1.0, "step": 0.01}),
                 "normalize": ("BOOLEAN", {"default": True}),
+            },
+            "optional": {
+                # batch：整批共用最小/最大值（原行为）；per_image：每张图独立归一化
+                "normalize_scope": (NORMALIZE_SCOPES, {"default": "batch"}),
+                # 每次处理的图片数，0 表示整批一次处理；长序列可调小以控制峰值内存
+                "chunk_size": ("INT", {"default": 0, "min": 0, "max": 4096}),
+                "output_dtype": (list(OUTPUT_DTYPES.keys()), {"default": "float32"}),
             }
         }
     
@@ -20,7 +80,8 @@ class ImageSubtraction:
     FUNCTION = "subtract_images"
     CATEGORY = "🐟Koi-Toolkit"
     
-    def subtract_images(self, image_a, image_b, mode="absolute_diff", threshold=0.1, normalize=True):
+    def subtract_images(self, image_a, image_b, mode="absolute_diff", threshold=0.1, normalize=True,
+                        normalize_scope="batch", chunk_size=0, output_dtype="float32"):
         """
         计算两张图片的差异
         
@@ -30,56 +91,63 @@ class ImageSubtraction:
         - mode: 差异计算模式
         - threshold: 阈值化模式下的阈值
         - normalize: 是否归一化输出
+        - normalize_scope: 归一化范围（整批 / 逐张）
+        - chunk_size: 分块处理的批大小
+        - output_dtype: 输出精度
         """
         
-        # 确保两张图片尺寸相同
-        if image_a.shape != image_b.shape:
-            # 调整image_b的尺寸匹配image_a
-            batch_size, height, width, channels = image_a.shape
-            image_b = torch.nn.functional.interpolate(
-                image_b.permute(0, 3, 1, 2), 
-                size=(height, width), 
-                mode='bilinear', 
-                align_corners=False
-            ).permute(0, 2, 3, 1)
+        batch_size, height, width = image_a.shape[:3]
+        ranges = _chunk_ranges(batch_size, chunk_size)
+        normalize = normalize and mode != "threshold_diff"
+        per_image = normalize_scope == "per_image"
+        batch_range = _BatchRange()
+        
+        # 输出只分配一次，逐块写入，中间结果的峰值内存约为一个块
+        diff_out = torch.empty((batch_size, height, width), dtype=OUTPUT_DTYPES[output_dtype], device=image_a.device)
         
         # 转换为灰度图进行差异计算（使用标准RGB到灰度的权重）
         def rgb_to_gray(img):
             return 0.299 * img[..., 0] + 0.587 * img[..., 1] + 0.114 * img[..., 2]
         
-        gray_a = rgb_to_gray(image_a)
-        gray_b = rgb_to_gray(image_b)
-        
-        # 根据模式计算差异
-        if mode == "absolute_diff":
-            # 绝对差异
-            diff = torch.abs(gray_a - gray_b)
-        elif mode == "signed_diff":
-            # 有符号差异 (A - B)
-            diff = gray_a - gray_b
-            # 将范围从[-1,1]映射到[0,1]
-            diff = (diff + 1.0) / 2.0
-        elif mode == "threshold_diff":
-            # 阈值化差异
-            abs_diff = torch.abs(gray_a - gray_b)
-            diff = (abs_diff > threshold).float()
-        else:
-            diff = torch.abs(gray_a - gray_b)
+        for start, end in ranges:
+            # 确保两张图片尺寸相同
+            gray_a = rgb_to_gray(image_a[start:end])
+            gray_b = rgb_to_gray(_slice_b(image_b, start, end, batch_size, height, width))
+            
+            # 根据模式计算差异
+            if mode == "absolute_diff":
+                # 绝对差异
+                diff = torch.abs(gray_a - gray_b)
+            elif mode == "signed_diff":
+                # 有符号差异 (A - B)
+                diff = gray_a - gray_b
+                # 将范围从[-1,1]映射到[0,1]
+                diff = (diff + 1.0) / 2.0
+            elif mode == "threshold_diff":
+                # 阈值化差异
+                abs_diff = torch.abs(gray_a - gray_b)
+                diff = (abs_diff > threshold).float()
+            else:
+                diff = torch.abs(gray_a - gray_b)
+            
+            # 归一化到[0,1]范围
+            if normalize and per_image:
+                diff = _normalize_per_image(diff)
+            elif normalize:
+                batch_range.update(diff)
+            
+            diff_out[start:end] = diff
         
-        # 归一化到[0,1]范围
-        if normalize and mode != "threshold_diff":
-            diff_min = diff.min()
-            diff_max = diff.max()
-            if diff_max > diff_min:
-                diff = (diff - diff_min) / (diff_max - diff_min)
+        if normalize and not per_image:
+            batch_range.apply_(diff_out, ranges)
         
         # 确保值在[0,1]范围内
-        diff = torch.clamp(diff, 0.0, 1.0)
+        diff_out.clamp_(0.0, 1.0)
         
-        # 创建彩色差异图像（将灰度差异复制到RGB三个通道）
-        diff_image = diff.unsqueeze(-1).repeat(1, 1, 1, 3)
+        # 创建彩色差异图像（三个通道共享同一份灰度差异数据，不复制）
+        diff_image = diff_out.unsqueeze(-1).expand(-1, -1, -1, 3)
         
-        return (diff, diff_image)
+        return (diff_out, diff_image)
 
 
 class ImageSubtractionAdvanced:
@@ -90,12 +158,19 @@ class ImageSubtractionAdvanced:
             "required": {
                 "image_a": ("IMAGE",),
                 "image_b": ("IMAGE",),
-                "method": (["L1", "L2", "SSIM", "per_channel"], {"default": "L1"}),
+                "method": (["L1", "L2", "SSIM", "MS-SSIM", "per_channel"], {"default": "L1"}),
                 "output_format": (["mask_only", "heatmap", "both"], {"default": "both"}),
             },
             "optional": {
-                "blur_sigma": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 5.0, "step": 0.1}),
+                "blur_sigma": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 32.0, "step": 0.1}),
+                # auto：小核用可分离卷积，大核用 FFT
+                "blur_method": (BLUR_METHODS, {"default": "auto"}),
                 "gamma_correction": ("FLOAT", {"default": 1.0, "min": 0.1, "max": 3.0, "step": 0.1}),
+                # SSIM / MS-SSIM 分块计算的块大小，0 表示整图计算
+                "tile_size": ("INT", {"default": 0, "min": 0, "max": 8192, "step": 64}),
+                "normalize_scope": (NORMALIZE_SCOPES, {"default": "batch"}),
+                "chunk_size": ("INT", {"default": 0, "min": 0, "max": 4096}),
+                "output_dtype": (list(OUTPUT_DTYPES.keys()), {"default": "float32"}),
             }
         }
     
@@ -105,50 +180,66 @@ class ImageSubtractionAdvanced:
     CATEGORY = "🐟Koi-Toolkit"
     
     def advanced_subtract(self, image_a, image_b, method="L1", output_format="both", 
-                         blur_sigma=0.0, gamma_correction=1.0):
+                         blur_sigma=0.0, gamma_correction=1.0, tile_size=0, blur_method="auto",
+                         normalize_scope="batch", chunk_size=0, output_dtype="float32"):
         """
         高级差异计算
+        
+        按 chunk_size 分块处理；整批归一化时先逐块算出差异图，再统一归一化并逐块生成热力图与叠加图。
         """
         
-        # 确保尺寸匹配
-        if image_a.shape != image_b.shape:
-            batch_size, height, width, channels = image_a.shape
-            image_b = torch.nn.functional.interpolate(
-                image_b.permute(0, 3, 1, 2), 
-                size=(height, width), 
-                mode='bilinear', 
-                align_corners=False
-            ).permute(0, 2, 3, 1)
-        
-        # 应用高斯模糊（如果需要）
-        if blur_sigma > 0:
-            from torch.nn.functional import conv2d
-            # 创建高斯核
-            kernel_size = int(6 * blur_sigma + 1)
-            if kernel_size % 2 == 0:
-                kernel_size += 1
+        batch_size, height, width, channels = image_a.shape
+        ranges = _chunk_ranges(batch_size, chunk_size)
+        per_image = normalize_scope == "per_image"
+        dtype = OUTPUT_DTYPES[output_dtype]
+        batch_range = _BatchRange()
+        
+        diff_out = torch.empty((batch_size, height, width), dtype=dtype, device=image_a.device)
+        heatmap = torch.empty((batch_size, height, width, channels), dtype=dtype, device=image_a.device)
+        overlay = torch.empty_like(heatmap)
+        
+        def prepare_a(start, end):
+            # 应用高斯模糊（如果需要）；所有通道一次完成，结果为新张量，不改动上游输入
+            a = image_a[start:end]
+            if blur_sigma > 0:
+                a = gaussian_blur(a.permute(0, 3, 1, 2), blur_sigma, method=blur_method).permute(0, 2, 3, 1)
+            return a
+        
+        blurred_a = None
+        for start, end in ranges:
+            a = prepare_a(start, end)
+            # 确保尺寸匹配
+            b = _slice_b(image_b, start, end, batch_size, height, width)
+            if blur_sigma > 0:
+                b = gaussian_blur(b.permute(0, 3, 1, 2), blur_sigma, method=blur_method).permute(0, 2, 3, 1)
             
-            x = torch.arange(kernel_size, dtype=torch.float32) - kernel_size // 2
-            gaussian_1d = torch.exp(-x**2 / (2 * blur_sigma**2))
-            gaussian_1d = gaussian_1d / gaussian_1d.sum()
+            diff = self.compute_diff(a, b, method, tile_size)
             
-            gaussian_2d = gaussian_1d[:, None] * gaussian_1d[None, :]
-            gaussian_2d = gaussian_2d[None, None, :, :]
+            # 应用伽马校正
+            if gamma_correction != 1.0:
+                diff = torch.pow(diff, gamma_correction)
             
-            # 对每个通道应用模糊
-            for i in range(3):
-                image_a[:, :, :, i:i+1] = conv2d(
-                    image_a[:, :, :, i:i+1].permute(0, 3, 1, 2),
-                    gaussian_2d,
-                    padding=kernel_size//2
-                ).permute(0, 2, 3, 1)
-                
-                image_b[:, :, :, i:i+1] = conv2d(
-                    image_b[:, :, :, i:i+1].permute(0, 3, 1, 2),
-                    gaussian_2d,
-                    padding=kernel_size//2
-                ).permute(0, 2, 3, 1)
+            if per_image:
+                # 逐张归一化不依赖其他块，可直接生成热力图与叠加图
+                diff = torch.clamp(_normalize_per_image(diff), 0.0, 1.0)
+                self.render_outputs(diff, a, heatmap[start:end], overlay[start:end])
+            else:
+                batch_range.update(diff)
+                if len(ranges) == 1:
+                    blurred_a = a
+            diff_out[start:end] = diff
+        
+        if not per_image:
+            # 归一化
+            batch_range.apply_(diff_out, ranges)
+            diff_out.clamp_(0.0, 1.0)
+            for start, end in ranges:
+                a = blurred_a if blurred_a is not None else prepare_a(start, end)
+                self.render_outputs(diff_out[start:end].float(), a, heatmap[start:end], overlay[start:end])
         
+        return (diff_out, heatmap, overlay)
+
+    def compute_diff(self, image_a, image_b, method, tile_size=0):
         # 根据方法计算差异
         if method == "L1":
             diff = torch.mean(torch.abs(image_a - image_b), dim=-1)
@@ -158,32 +249,42 @@ class ImageSubtractionAdvanced:
             # 分通道计算差异并取最大值
             channel_diffs = torch.abs(image_a - image_b)
             diff = torch.max(channel_diffs, dim=-1)[0]
-        else:  # SSIM需要更复杂的实现，这里用简化版本
+        elif method in ("SSIM", "MS-SSIM"):
+            diff = self.structural_diff(image_a, image_b, method, tile_size)
+        else:
             diff = torch.mean(torch.abs(image_a - image_b), dim=-1)
-        
-        # 应用伽马校正
-        if gamma_correction != 1.0:
-            diff = torch.pow(diff, gamma_correction)
-        
-        # 归一化
-        diff_min = diff.min()
-        diff_max = diff.max()
-        if diff_max > diff_min:
-            diff = (diff - diff_min) / (diff_max - diff_min)
-        
-        diff = torch.clamp(diff, 0.0, 1.0)
-        
+        return diff
+
+    def render_outputs(self, diff, image_a, heatmap, overlay):
+        """把一块归一化后的差异写入预分配的热力图/叠加图切片。"""
         # 创建热力图（红色表示差异大的区域）
-        heatmap = torch.zeros_like(image_a)
+        heatmap.zero_()
         heatmap[..., 0] = diff  # 红色通道
         heatmap[..., 1] = 1.0 - diff  # 绿色通道（差异小的地方为绿色）
         heatmap[..., 2] = 1.0 - diff  # 蓝色通道
         
         # 创建叠加图像
-        overlay = 0.7 * image_a + 0.3 * heatmap
-        overlay = torch.clamp(overlay, 0.0, 1.0)
-        
-        return (diff, heatmap, overlay)
+        overlay.copy_(torch.clamp(0.7 * image_a + 0.3 * heatmap.float(), 0.0, 1.0))
+
+    def structural_diff(self, image_a, image_b, method, tile_size=0):
+        """结构差异图 (1 - SSIM) / 2，取值 [0,1]；整批在 torch 中用可分离高斯卷积计算。"""
+        a = image_a.permute(0, 3, 1, 2)
+        b = image_b.permute(0, 3, 1, 2)
+        if method == "MS-SSIM":
+            levels = ms_ssim_levels(a.shape[-2], a.shape[-1])
+            fn = lambda x, y: ms_ssim_map(x, y, levels)
+            # 分块起点按最粗尺度对齐，halo 覆盖最粗尺度的窗口
+            align = 2 ** (levels - 1)
+            halo = (SSIM_RADIUS + 1) * align
+        else:
+            fn = ssim_map
+            align = 1
+            halo = SSIM_RADIUS
+        if tile_size > 0 and max(a.shape[-2], a.shape[-1]) > tile_size:
+            similarity = tiled_map(fn, a, b, tile_size, halo, align)
+        else:
+            similarity = fn(a, b)
+        return ((1.0 - similarity) * 0.5).clamp_(0.0, 1.0)
 
 
 # 节点映射
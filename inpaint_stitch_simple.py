@@ -3,39 +3,85 @@ import torchvision.transforms.functional as F
 from PIL import Image
 
 
-def rescale_i(samples, width, height, algorithm: str):
-    """调整图像大小的辅助函数"""
+RESIZE_BACKENDS = ["torch", "pil"]
+
+# PIL 算法名 -> (interpolate 模式, 是否抗锯齿)；lanczos / hamming 没有对应实现，分别用 bicubic / bilinear 近似
+TORCH_RESIZE_MODES = {
+    "nearest": ("nearest-exact", False),
+    "bilinear": ("bilinear", True),
+    "bicubic": ("bicubic", True),
+    "lanczos": ("bicubic", True),
+    "hamming": ("bilinear", True),
+    "box": ("area", False),
+}
+
+
+def rescale_i(samples, width, height, algorithm: str, backend="pil"):
+    """调整图像大小的辅助函数，samples: [B,H,W,C]
+
+    pil：逐张转为 8 位 PIL 图像缩放（原实现）；torch：整批一次 interpolate，保持浮点精度并留在原设备。
+    """
+    if backend == "torch":
+        mode, antialias = TORCH_RESIZE_MODES.get(algorithm.lower(), ("bicubic", True))
+        samples = samples.movedim(-1, 1)
+        if mode in ("bilinear", "bicubic"):
+            samples = torch.nn.functional.interpolate(samples, size=(height, width), mode=mode,
+                                                      align_corners=False, antialias=antialias)
+            # bicubic 会产生过冲，与 PIL 的 8 位结果一样截断到 [0,1]
+            samples = samples.clamp(0.0, 1.0)
+        else:
+            samples = torch.nn.functional.interpolate(samples, size=(height, width), mode=mode)
+        return samples.movedim(1, -1)
+
     samples = samples.movedim(-1, 1)
     algorithm = getattr(Image, algorithm.upper())  # 例如 Image.BICUBIC
-    samples_pil: Image.Image = F.to_pil_image(samples[0].cpu()).resize((width, height), algorithm)
-    samples = F.to_tensor(samples_pil).unsqueeze(0)
+    resized = []
+    for sample in samples:
+        samples_pil: Image.Image = F.to_pil_image(sample.cpu()).resize((width, height), algorithm)
+        resized.append(F.to_tensor(samples_pil))
+    samples = torch.stack(resized, dim=0)
     samples = samples.movedim(1, -1)
     return samples
 
 
-def stitch_simple(canvas_image, new_image, ctc_x, ctc_y, ctc_w, ctc_h, cto_x, cto_y, cto_w, cto_h, downscale_algorithm, upscale_algorithm):
-    """
-    简化版的图像拼接函数，直接将新图像拼接到画布上，不使用遮罩混合
-    """
-    canvas_image = canvas_image.clone()
-    new_image = new_image.clone()
-    
-    # 调整新图像大小以匹配目标区域
+def resize_to_crop(new_image, ctc_w, ctc_h, downscale_algorithm, upscale_algorithm, backend="pil"):
+    """按目标区域大小缩放新图像（放大/缩小分别使用对应算法）"""
     _, h, w, _ = new_image.shape
     if ctc_w > w or ctc_h > h:  # 需要放大
-        resized_image = rescale_i(new_image, ctc_w, ctc_h, upscale_algorithm)
-    else:  # 需要缩小
-        resized_image = rescale_i(new_image, ctc_w, ctc_h, downscale_algorithm)
-    
-    # 直接将调整大小后的图像粘贴到画布上
-    canvas_image[:, ctc_y:ctc_y + ctc_h, ctc_x:ctc_x + ctc_w] = resized_image
+        return rescale_i(new_image, ctc_w, ctc_h, upscale_algorithm, backend)
+    # 需要缩小
+    return rescale_i(new_image, ctc_w, ctc_h, downscale_algorithm, backend)
+
+
+def paste_and_crop(canvas_image, resized_image, ctc_x, ctc_y, ctc_w, ctc_h, cto_x, cto_y, cto_w, cto_h):
+    """等价于“粘贴到画布副本后再裁剪回原图区域”，但只复制裁剪窗口，并只写入两区域的交集。
+
+    canvas_image 为 [1,H,W,C] 而 resized_image 为 [B,h,w,C] 时，一次分配 [B,cto_h,cto_w,C] 输出并整批写入。
+    """
+    window = canvas_image[:, cto_y:cto_y + cto_h, cto_x:cto_x + cto_w]
+    output_image = window.expand(resized_image.shape[0], -1, -1, -1).clone(memory_format=torch.contiguous_format)
     
-    # 裁剪回原始图像区域
-    output_image = canvas_image[:, cto_y:cto_y + cto_h, cto_x:cto_x + cto_w]
+    y0, y1 = max(ctc_y, cto_y), min(ctc_y + ctc_h, cto_y + cto_h)
+    x0, x1 = max(ctc_x, cto_x), min(ctc_x + ctc_w, cto_x + cto_w)
+    if y1 > y0 and x1 > x0:
+        output_image[:, y0 - cto_y:y1 - cto_y, x0 - cto_x:x1 - cto_x] = \
+            resized_image[:, y0 - ctc_y:y1 - ctc_y, x0 - ctc_x:x1 - ctc_x]
     
     return output_image
 
 
+def stitch_simple(canvas_image, new_image, ctc_x, ctc_y, ctc_w, ctc_h, cto_x, cto_y, cto_w, cto_h, downscale_algorithm, upscale_algorithm,
+                  backend="pil"):
+    """
+    简化版的图像拼接函数，直接将新图像拼接到画布上，不使用遮罩混合
+    """
+    # 调整新图像大小以匹配目标区域
+    resized_image = resize_to_crop(new_image, ctc_w, ctc_h, downscale_algorithm, upscale_algorithm, backend)
+    
+    # 直接将调整大小后的图像粘贴到画布上，并裁剪回原始图像区域
+    return paste_and_crop(canvas_image, resized_image, ctc_x, ctc_y, ctc_w, ctc_h, cto_x, cto_y, cto_w, cto_h)
+
+
 class SimpleImageStitch:
     """
     简化版图像拼接节点
@@ -49,6 +95,10 @@ class SimpleImageStitch:
             "required": {
                 "stitcher": ("STITCHER",),
                 "new_image": ("IMAGE",),
+            },
+            "optional": {
+                # torch：整批浮点缩放（lanczos/hamming 为近似）；pil：逐张 8 位 PIL 缩放，与旧版结果一致
+                "resize_backend": (RESIZE_BACKENDS, {"default": "torch"}),
             }
         }
     
@@ -60,10 +110,7 @@ class SimpleImageStitch:
     
     FUNCTION = "stitch_simple_image"
     
-    def stitch_simple_image(self, stitcher, new_image):
-        new_image = new_image.clone()
-        results = []
-        
+    def stitch_simple_image(self, stitcher, new_image, resize_backend="torch"):
         batch_size = new_image.shape[0]
         assert len(stitcher['cropped_to_canvas_x']) == batch_size or len(stitcher['cropped_to_canvas_x']) == 1, \
             "Stitch batch size doesn't match image batch size"
@@ -72,6 +119,16 @@ class SimpleImageStitch:
         if len(stitcher['cropped_to_canvas_x']) != batch_size and len(stitcher['cropped_to_canvas_x']) == 1:
             override = True
         
+        if override:
+            # 所有图像共用同一组参数：整批一次缩放，一次分配输出并整批粘贴
+            canvas_image = stitcher['canvas_image'][0]
+            ctc = [stitcher[key][0] for key in ['cropped_to_canvas_x', 'cropped_to_canvas_y', 'cropped_to_canvas_w', 'cropped_to_canvas_h']]
+            cto = [stitcher[key][0] for key in ['canvas_to_orig_x', 'canvas_to_orig_y', 'canvas_to_orig_w', 'canvas_to_orig_h']]
+            resized = resize_to_crop(new_image, ctc[2], ctc[3], stitcher['downscale_algorithm'], stitcher['upscale_algorithm'],
+                                     resize_backend)
+            return (paste_and_crop(canvas_image, resized, *ctc, *cto),)
+        
+        results = []
         for b in range(batch_size):
             one_image = new_image[b]
             one_stitcher = {}
@@ -84,22 +141,18 @@ class SimpleImageStitch:
             for key in ['canvas_to_orig_x', 'canvas_to_orig_y', 'canvas_to_orig_w', 'canvas_to_orig_h', 
                        'canvas_image', 'cropped_to_canvas_x', 'cropped_to_canvas_y', 
                        'cropped_to_canvas_w', 'cropped_to_canvas_h']:
-                if override:  # 一个stitcher用于多张图像
-                    one_stitcher[key] = stitcher[key][0]
-                else:
-                    one_stitcher[key] = stitcher[key][b]
+                one_stitcher[key] = stitcher[key][b]
             
             one_image = one_image.unsqueeze(0)
-            one_image = self.stitch_single_image(one_stitcher, one_image)
+            one_image = self.stitch_single_image(one_stitcher, one_image, resize_backend)
             one_image = one_image.squeeze(0)
-            one_image = one_image.clone()
             results.append(one_image)
         
         result_batch = torch.stack(results, dim=0)
         
         return (result_batch,)
     
-    def stitch_single_image(self, stitcher, new_image):
+    def stitch_single_image(self, stitcher, new_image, resize_backend="torch"):
         downscale_algorithm = stitcher['downscale_algorithm']
         upscale_algorithm = stitcher['upscale_algorithm']
         canvas_image = stitcher['canvas_image']
@@ -115,7 +168,8 @@ class SimpleImageStitch:
         cto_h = stitcher['canvas_to_orig_h']
         
         output_image = stitch_simple(canvas_image, new_image, ctc_x, ctc_y, ctc_w, ctc_h, 
-                                   cto_x, cto_y, cto_w, cto_h, downscale_algorithm, upscale_algorithm)
+                                   cto_x, cto_y, cto_w, cto_h, downscale_algorithm, upscale_algorithm,
+                                   resize_backend)
         
         return output_image
 
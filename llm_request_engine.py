@@ -0,0 +1,329 @@
+import asyncio
+import queue
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from json import loads as json_loads
+
+try:
+    import httpx
+except Exception as e:
+    httpx = None
+
+# 这些状态码通常是暂时性的，值得重试
+RETRY_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# 异常信息中附带的响应体最大字符数（完整响应体保存在 RequestEngineError.body）
+ERROR_BODY_LIMIT = 500
+
+
+class RequestEngineError(RuntimeError):
+    def __init__(self, message, status_code=None, body=""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class CircuitOpenError(RequestEngineError):
+    pass
+
+
+def _error_message(status_code, url, body):
+    detail = " ".join((body or "").split())
+    if len(detail) > ERROR_BODY_LIMIT:
+        detail = detail[:ERROR_BODY_LIMIT] + "..."
+    message = f"HTTP {status_code} from {url}"
+    return f"{message}: {detail}" if detail else message
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回需等待的秒数或 None。"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class TokenBucket:
+    """异步令牌桶：rate 为每秒补充的令牌数，capacity 为突发容量，rate<=0 表示不限速。"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断 reset_timeout 秒，之后放行一次试探请求（half-open）。"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def end_probe(self):
+        """试探请求既未成功也未记为失败（如被取消或抛出其他异常）时调用，允许下一次试探。"""
+        self.probing = False
+
+
+class RequestEngine:
+    """LLM API 节点共享的异步请求引擎。
+
+    在后台线程的事件循环上运行，复用一个带连接池的 httpx.AsyncClient，
+    提供指数退避 + 抖动重试（遵循 Retry-After）、按调用方传入的令牌桶限速（create_rate_limiter）
+    以及按 base_url 的熔断。节点的同步 run 方法通过 *_sync 包装调用。
+    """
+
+    def __init__(self, max_retries=4, backoff_base=0.5, backoff_max=30.0,
+                 failure_threshold=5, reset_timeout=30.0, max_connections=64):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_connections = max_connections
+        self._loop = None
+        self._client = None
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    # ---- 事件循环与客户端 ----
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="koi-request-engine", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self):
+        if httpx is None:
+            raise RuntimeError("httpx 库未安装，请在该插件的 requirements.txt 中添加 httpx 并安装")
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(limits=limits)
+        return self._client
+
+    def run_sync(self, coro):
+        """在引擎事件循环上执行协程并阻塞等待结果，供同步节点代码使用。"""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    # ---- 限速与熔断 ----
+    def create_rate_limiter(self, rate, burst=None):
+        """创建令牌桶（每秒 rate 个请求，rate<=0 不限速），经 limiter 参数传给 request_json / stream_json。
+
+        限速只约束传入它的那些请求（例如一次批量运行），不会影响其他节点。
+        """
+        return self.run_sync(self._new_bucket(rate, burst))
+
+    async def _new_bucket(self, rate, burst):
+        return TokenBucket(rate, burst)
+
+    def _breaker(self, base_url):
+        key = (base_url or "").rstrip("/")
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max * 4)
+        # full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # ---- 请求 ----
+    def _check_failure(self, breaker, response, body, url, attempt, retries):
+        """处理 >=400 的响应：不可重试或重试耗尽时抛出异常，否则返回 Retry-After 秒数（可能为 None）。"""
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if response.status_code not in RETRY_STATUS or attempt >= retries:
+            raise RequestEngineError(_error_message(response.status_code, url, body), response.status_code, body)
+        return parse_retry_after(response.headers.get("retry-after"))
+
+    async def request_json(self, method, url, base_url=None, api_key="", headers=None, json=None,
+                           timeout=60.0, max_retries=None, limiter=None):
+        base_url = base_url or url
+        retries = self.max_retries if max_retries is None else max_retries
+        breaker = self._breaker(base_url)
+        client = self._get_client()
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {base_url}, too many consecutive failures")
+            # 熔断后 allow() 放行的请求即为试探请求；单线程事件循环中此时 probing 只可能属于本请求
+            probe = breaker.probing
+
+            retry_after = None
+            try:
+                if limiter is not None:
+                    await limiter.acquire()
+                response = await client.request(method, url, headers=headers, json=json, timeout=timeout)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if attempt >= retries:
+                    raise RequestEngineError(f"{type(e).__name__}: {e}") from e
+            except BaseException:
+                # 其他异常（如 TooManyRedirects、取消）不计入失败，但必须结束试探，否则熔断永不恢复
+                if probe:
+                    breaker.end_probe()
+                raise
+            else:
+                if response.status_code < 400:
+                    breaker.record_success()
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise RequestEngineError(f"Invalid JSON response: {e}", response.status_code, response.text)
+                retry_after = self._check_failure(breaker, response, response.text, url, attempt, retries)
+
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+
+    async def stream_json(self, method, url, base_url=None, api_key="", headers=None, json=None,
+                          timeout=300.0, max_retries=None, limiter=None):
+        """以 SSE 方式请求，逐个产出 `data:` 行解析后的 JSON。仅在收到首字节前重试。"""
+        base_url = base_url or url
+        retries = self.max_retries if max_retries is None else max_retries
+        breaker = self._breaker(base_url)
+        client = self._get_client()
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {base_url}, too many consecutive failures")
+            probe = breaker.probing
+
+            retry_after = None
+            try:
+                if limiter is not None:
+                    await limiter.acquire()
+                request = client.build_request(method, url, headers=headers, json=json, timeout=timeout)
+                response = await client.send(request, stream=True)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if attempt >= retries:
+                    raise RequestEngineError(f"{type(e).__name__}: {e}") from e
+            except BaseException:
+                if probe:
+                    breaker.end_probe()
+                raise
+            else:
+                if response.status_code < 400:
+                    breaker.record_success()
+                    try:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            try:
+                                yield json_loads(data)
+                            except ValueError:
+                                continue
+                    finally:
+                        await response.aclose()
+                    return
+                try:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                except BaseException:
+                    if probe:
+                        breaker.end_probe()
+                    raise
+                finally:
+                    await response.aclose()
+                retry_after = self._check_failure(breaker, response, body, url, attempt, retries)
+
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+
+    def request_json_sync(self, method, url, **kwargs):
+        return self.run_sync(self.request_json(method, url, **kwargs))
+
+    def stream_json_sync(self, method, url, **kwargs):
+        """stream_json 的同步生成器版本：事件在调用线程中逐个产出。"""
+        events = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for event in self.stream_json(method, url, **kwargs):
+                    events.put((True, event))
+            except Exception as e:
+                events.put((False, e))
+            finally:
+                events.put((True, done))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._ensure_loop())
+        try:
+            while True:
+                ok, item = events.get()
+                if item is done:
+                    break
+                if not ok:
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_engine():
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            _ENGINE = RequestEngine()
+        return _ENGINE
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import folder_paths
+except Exception as e:
+    folder_paths = None
+
+# 缓存容量上限：超过任一限制时按最近访问时间淘汰
+CACHE_MAX_ENTRIES = 20000
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 不影响响应内容的请求字段，不参与缓存键
+_IGNORED_KEYS = {"stream", "stream_options"}
+
+
+def _strip_images(value):
+    """将消息中的 data URI 图像替换为其内容哈希，使缓存键稳定且紧凑。"""
+    if isinstance(value, dict):
+        return {k: _strip_images(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_strip_images(v) for v in value]
+    if isinstance(value, str) and value.startswith("data:") and len(value) > 256:
+        return "sha256:" + hashlib.sha256(value.encode("utf-8")).hexdigest()
+    return value
+
+
+def make_cache_key(base_url, payload):
+    """根据 base_url 与请求体（model、messages、temperature、max_tokens 等）生成缓存键。"""
+    body = {k: v for k, v in payload.items() if k not in _IGNORED_KEYS}
+    canonical = json.dumps(
+        {"base_url": (base_url or "").rstrip("/"), "payload": _strip_images(body)},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _default_cache_path():
+    base = None
+    if folder_paths is not None:
+        try:
+            base = folder_paths.get_user_directory()
+        except Exception:
+            base = None
+    if not base:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, "koi_toolkit_cache", "llm_responses.sqlite3")
+
+
+class ResponseCache:
+    """基于 SQLite 的 LLM 响应缓存，支持 TTL 与条目数/字节数上限。"""
+
+    def __init__(self, path, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses(accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value, ttl):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), now + float(ttl), now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # 按最近访问时间从旧到新淘汰，直到满足两个上限
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache():
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache(_default_cache_path())
+        return _CACHE
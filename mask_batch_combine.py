@@ -1,25 +1,112 @@
 import torch
 
+COMBINE_MODES = ["sum_clamp", "union", "intersection", "majority", "weighted"]
+
+
+def _parse_weights(weights):
+    return [float(w) for w in weights.replace(";", ",").split(",") if w.strip()]
+
+
+def _iter_chunks(masks, chunk_size):
+    # torch.split returns views, so the batch is never copied or stacked
+    for m in masks:
+        if m.dim() == 2:
+            m = m.unsqueeze(0)
+        yield from torch.split(m, chunk_size, dim=0)
+
+
+def combine_masks(masks, mode="sum_clamp", chunk_size=64, binarize=False, weights=None):
+    """Reduce a list of [B,H,W] / [H,W] masks to a single [1,H,W] mask chunk by chunk.
+
+    Only one accumulator plus one chunk of temporaries is alive at a time. With binarize=True
+    inputs are thresholded at 0.5 and union / sum_clamp / intersection accumulate in bool.
+    """
+    chunk_size = max(1, int(chunk_size))
+    weights = weights or []
+    acc = None
+    count = 0
+    weight_sum = 0.0
+
+    for chunk in _iter_chunks(masks, chunk_size):
+        n = chunk.shape[0]
+        if mode == "majority" or binarize:
+            chunk = chunk > 0.5
+
+        if mode == "majority":
+            part = chunk.sum(dim=0, dtype=torch.int32)
+            acc = part if acc is None else acc.add_(part)
+        elif mode == "weighted":
+            w = [weights[(count + i) % len(weights)] if weights else 1.0 for i in range(n)]
+            weight_sum += sum(w)
+            w = torch.tensor(w, dtype=torch.float32, device=chunk.device).view(-1, 1, 1)
+            part = (chunk.to(torch.float32) * w).sum(dim=0)
+            acc = part if acc is None else acc.add_(part)
+        elif mode == "intersection":
+            part = chunk.all(dim=0) if binarize else chunk.amin(dim=0)
+            if acc is None:
+                acc = part
+            elif binarize:
+                acc.logical_and_(part)
+            else:
+                torch.minimum(acc, part, out=acc)
+        elif mode == "union" or binarize:
+            # for binary masks sum_clamp is the same as union
+            part = chunk.any(dim=0) if binarize else chunk.amax(dim=0)
+            if acc is None:
+                acc = part
+            elif binarize:
+                acc.logical_or_(part)
+            else:
+                torch.maximum(acc, part, out=acc)
+        else:
+            # values are non-negative, so clamping after every chunk equals clamping the full sum
+            part = chunk.sum(dim=0)
+            acc = part if acc is None else acc.add_(part)
+            acc.clamp_(0.0, 1.0)
+        count += n
+
+    if acc is None:
+        raise ValueError("MaskBatchCombine: no masks to combine")
+
+    if mode == "majority":
+        result = (acc * 2 > count).to(torch.float32)
+    elif mode == "weighted":
+        result = (acc / weight_sum if weight_sum else acc).clamp_(0.0, 1.0)
+    else:
+        result = acc.to(torch.float32)
+    return result.unsqueeze(0)
+
+
 class MaskBatchCombine:
     @classmethod
     def INPUT_TYPES(s):
         return {
             "required": {
                 "mask": ("MASK",),
+            },
+            "optional": {
+                # sum_clamp keeps the original behaviour; majority keeps pixels set in more than half of the masks
+                "mode": (COMBINE_MODES, {"default": "sum_clamp"}),
+                "chunk_size": ("INT", {"default": 64, "min": 1, "max": 4096, "tooltip": "Masks reduced per step; bounds peak memory"}),
+                "binarize": ("BOOLEAN", {"default": False, "tooltip": "Threshold inputs at 0.5 and accumulate in bool"}),
+                "weights": ("STRING", {"default": "", "tooltip": "Comma-separated weights for weighted mode, repeated if shorter than the batch"}),
             }
         }
 
+    # Accepts a mask list (e.g. per-detection outputs) as well as a single batch, so masks never need stacking
+    INPUT_IS_LIST = True
     RETURN_TYPES = ("MASK",)
     FUNCTION = "combine"
     CATEGORY = "🐟Koi-Toolkit"
 
-    def combine(self, mask):
-        # mask shape: [B, H, W]
-        # Sum along batch dimension (dim 0)
-        # keepdim=True to maintain [1, H, W] shape which is compatible with single mask
-        result = torch.sum(mask, dim=0, keepdim=True)
-        # Clamp to ensure values are between 0 and 1
-        result = torch.clamp(result, 0.0, 1.0)
+    def combine(self, mask, mode=None, chunk_size=None, binarize=None, weights=None):
+        # with INPUT_IS_LIST every input arrives as a list; widgets use their first value
+        mode = mode[0] if mode else "sum_clamp"
+        chunk_size = chunk_size[0] if chunk_size else 64
+        binarize = binarize[0] if binarize else False
+        weights = _parse_weights(weights[0]) if weights else []
+
+        result = combine_masks(mask, mode, chunk_size, binarize, weights)
         return (result,)
 
 NODE_CLASS_MAPPINGS = {
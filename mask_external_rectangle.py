@@ -1,7 +1,8 @@
+import os
 import torch
 import numpy as np
 import cv2
-from scipy.spatial import ConvexHull
+from concurrent.futures import ThreadPoolExecutor
 
 
 class MaskExternalRectangle:
@@ -11,6 +12,12 @@ class MaskExternalRectangle:
         return {
             "required": {
                 "mask": ("MASK",),
+            },
+            "optional": {
+                # min_area: 最小面积旋转矩形；axis_aligned: 轴对齐包围框（仅做行/列归约）
+                "mode": (["min_area", "axis_aligned"], {"default": "min_area"}),
+                # 为每个连通区域分别计算外接矩形
+                "per_component": ("BOOLEAN", {"default": False}),
             }
         }
     
@@ -22,7 +29,12 @@ class MaskExternalRectangle:
     
     FUNCTION = "get_external_rectangle"
     
-    def minimum_area_rectangle(self, points):
+    # 覆盖修正时矩形每边向外扩展的像素数，吸收 minAreaRect 的浮点误差
+    COVER_PAD = 0.25
+    # 覆盖修正时 fillPoly 使用的小数位数（定点坐标）
+    COVER_SHIFT = 8
+
+    def minimum_area_rectangle(self, points, pad=0.0):
 
         if len(points) < 3:
             # 如果点少于3个，返回轴对齐的边界框
@@ -30,78 +42,111 @@ class MaskExternalRectangle:
             max_x, max_y = np.max(points, axis=0)
             return np.array([[min_x, min_y], [max_x, min_y], [max_x, max_y], [min_x, max_y]])
         
-        try:
-            # 计算凸包
-            hull = ConvexHull(points)
-            hull_points = points[hull.vertices]
-            
-            # 使用OpenCV的minAreaRect找到最小面积外接矩形
-            rect = cv2.minAreaRect(hull_points.astype(np.float32))
-            box = cv2.boxPoints(rect)
-            return box.astype(np.int32)
-            
-        except Exception:
-            # 如果凸包计算失败，回退到轴对齐的边界框
-            min_x, min_y = np.min(points, axis=0)
-            max_x, max_y = np.max(points, axis=0)
-            return np.array([[min_x, min_y], [max_x, min_y], [max_x, max_y], [min_x, max_y]])
+        # minAreaRect 内部会先求凸包，直接传入轮廓点即可
+        rect = cv2.minAreaRect(points.astype(np.float32))
+        if pad > 0:
+            (cx, cy), (w, h), angle = rect
+            rect = ((cx, cy), (w + 2 * pad, h + 2 * pad), angle)
+            # 保留小数坐标，由调用方按亚像素精度填充
+            return cv2.boxPoints(rect)
+        box = cv2.boxPoints(rect)
+        return box.astype(np.int32)
 
-    def fill_polygon_mask(self, mask_shape, polygon_points):
+    def fill_polygon_mask(self, mask, polygon_points):
 
-        mask = np.zeros(mask_shape, dtype=np.uint8)
-        
         # 确保坐标在有效范围内
-        polygon_points = np.clip(polygon_points, 0, [mask_shape[1]-1, mask_shape[0]-1])
+        polygon_points = np.clip(polygon_points, 0, [mask.shape[1]-1, mask.shape[0]-1])
         
         # 使用OpenCV填充多边形
         cv2.fillPoly(mask, [polygon_points.astype(np.int32)], 1)
         
         return mask
 
-    def get_external_rectangle(self, mask):
+    def cover_polygon_mask(self, mask, polygon_points):
+        """按亚像素精度填充，中心落在多边形内的像素全部置 1。
+
+        顶点超出图像时 fillPoly 的裁剪会漏掉边缘像素，因此先在恰好容纳多边形的画布上填充，再把与图像相交的部分合并回去。
+        """
+        points = np.asarray(polygon_points, dtype=np.float64)
+        height, width = mask.shape
+        x0, y0 = int(np.floor(points[:, 0].min())), int(np.floor(points[:, 1].min()))
+        x1, y1 = int(np.ceil(points[:, 0].max())) + 1, int(np.ceil(points[:, 1].max())) + 1
+        canvas = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        scaled = np.round((points - (x0, y0)) * (1 << self.COVER_SHIFT)).astype(np.int32)
+        cv2.fillPoly(canvas, [scaled], 1, shift=self.COVER_SHIFT)
+
+        ix0, iy0, ix1, iy1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+        if ix1 > ix0 and iy1 > iy0:
+            mask[iy0:iy1, ix0:ix1] |= canvas[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0]
+        return mask
+
+    def rectangle_single(self, mask_np, mode, per_component):
+        """单张 uint8 mask -> 外接矩形 mask (float32)。只提取外轮廓点，耗时与内存随周长而非面积增长。"""
+        result = np.zeros(mask_np.shape, dtype=np.uint8)
+        contours, _ = cv2.findContours(mask_np, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return result.astype(np.float32)
+
+        groups = [c.reshape(-1, 2) for c in contours] if per_component else [np.concatenate(contours).reshape(-1, 2)]
+        for points in groups:
+            if mode == "axis_aligned":
+                min_x, min_y = np.min(points, axis=0)
+                max_x, max_y = np.max(points, axis=0)
+                result[min_y:max_y + 1, min_x:max_x + 1] = 1
+            else:
+                self.fill_polygon_mask(result, self.minimum_area_rectangle(points))
+
+        # 角点取整与顶点裁剪偶尔会让少数 mask 像素落在矩形外；此时补上外扩后按亚像素精度填充的矩形，
+        # 保证每个输入像素都被覆盖（其余情况输出不变）
+        if mode != "axis_aligned" and (mask_np > result).any():
+            for points in groups:
+                if len(points) >= 3:
+                    self.cover_polygon_mask(result, self.minimum_area_rectangle(points, self.COVER_PAD))
+        return result.astype(np.float32)
+
+    def axis_aligned_batch(self, mask):
+        """整批轴对齐包围框：只用行/列 any 归约，全程在原设备上完成。"""
+        nonzero = mask != 0
+        rows = nonzero.any(dim=2)
+        cols = nonzero.any(dim=1)
+        height, width = rows.shape[1], cols.shape[1]
+        ys = torch.arange(height, device=mask.device)
+        xs = torch.arange(width, device=mask.device)
+
+        y_min = rows.int().argmax(dim=1, keepdim=True)
+        y_max = height - 1 - rows.flip(1).int().argmax(dim=1, keepdim=True)
+        x_min = cols.int().argmax(dim=1, keepdim=True)
+        x_max = width - 1 - cols.flip(1).int().argmax(dim=1, keepdim=True)
+
+        # 空 mask 的 any 全为 False，对应行区间也随之为空
+        row_in = (ys >= y_min) & (ys <= y_max) & rows.any(dim=1, keepdim=True)
+        col_in = (xs >= x_min) & (xs <= x_max)
+        return (row_in[:, :, None] & col_in[:, None, :]).float()
+
+    def get_external_rectangle(self, mask, mode="min_area", per_component=False):
 
         # 处理输入mask的维度
         if mask.dim() == 2:
             # 如果是2D，添加batch维度
             mask = mask.unsqueeze(0)
         
-        batch_size, height, width = mask.shape
-        result_masks = []
-        
-        for i in range(batch_size):
-            current_mask = mask[i]
-            
-            # 找到非零像素的坐标
-            nonzero_coords = torch.nonzero(current_mask, as_tuple=False)
-            
-            if len(nonzero_coords) == 0:
-                # 如果没有非零像素，返回全零mask
-                result_mask = torch.zeros_like(current_mask)
-            else:
-                # 转换为numpy格式 (x, y)
-                points = nonzero_coords.cpu().numpy()
-                # 交换坐标：torch的nonzero返回(row, col)，我们需要(x, y)即(col, row)
-                points = points[:, [1, 0]]  # 从(row, col)转为(x, y)
-                
-                # 计算最小面积外接矩形
-                rectangle_points = self.minimum_area_rectangle(points)
-                
-                # 创建结果mask
-                result_mask_np = self.fill_polygon_mask((height, width), rectangle_points)
-                result_mask = torch.from_numpy(result_mask_np.astype(np.float32))
-            
-            result_masks.append(result_mask)
-        
-        # 合并所有batch的结果
-        result = torch.stack(result_masks, dim=0)
-        
-        # 如果输入是2D的，返回2D结果
-        if result.shape[0] == 1 and len(mask.shape) == 3 and mask.shape[0] == 1:
-            return (result,)
-        elif result.shape[0] == 1:
-            return (result.squeeze(0),)
+        if mode == "axis_aligned" and not per_component:
+            return (self.axis_aligned_batch(mask),)
+
+        masks_np = (mask != 0).to(torch.uint8).cpu().numpy()
+        batch_size = masks_np.shape[0]
+
+        # findContours / fillPoly 会释放 GIL，批次在线程池中并行处理
+        workers = min(batch_size, os.cpu_count() or 1)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                result_masks = list(pool.map(lambda m: self.rectangle_single(m, mode, per_component), masks_np))
         else:
-            return (result,)
+            result_masks = [self.rectangle_single(m, mode, per_component) for m in masks_np]
+
+        # 合并所有batch的结果
+        result = torch.from_numpy(np.stack(result_masks, axis=0))
+        return (result,)
 
 
 NODE_CLASS_MAPPINGS = {
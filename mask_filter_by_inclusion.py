@@ -1,6 +1,8 @@
+import os
 import torch
 import numpy as np
 import cv2
+from concurrent.futures import ThreadPoolExecutor
 
 class MaskFilterByInclusion:
     @classmethod
@@ -17,50 +19,51 @@ class MaskFilterByInclusion:
     FUNCTION = "process"
     CATEGORY = "🐟Koi-Toolkit"
 
+    @staticmethod
+    def _filter_single(m1, m2_uint8, threshold):
+        # Connected components
+        num_labels, labels = cv2.connectedComponents((m1 > 0.5).astype(np.uint8))
+        if num_labels <= 1:
+            return m1.copy()
+
+        # Per-label area and overlap with the reference in a single pass
+        flat_labels = labels.ravel()
+        component_area = np.bincount(flat_labels, minlength=num_labels)
+        overlap_count = np.bincount(flat_labels, weights=m2_uint8.ravel(), minlength=num_labels)
+
+        ratio = overlap_count / np.maximum(component_area, 1)
+
+        # Lookup table: True for labels to remove; 0 is background and is never removed
+        drop = ratio >= threshold
+        drop[0] = False
+
+        out_m = m1.copy()
+        out_m[drop[labels]] = 0.0
+        return out_m
+
     def process(self, mask_to_filter, mask_reference, threshold):
         # mask inputs are torch tensors [B, H, W]
-        
-        result_masks = []
-        
+
         # Handle batch size differences simply
         B1 = mask_to_filter.shape[0]
         B2 = mask_reference.shape[0]
-        
-        for i in range(B1):
-            m1 = mask_to_filter[i].cpu().numpy()
-            m2 = mask_reference[i % B2].cpu().numpy()
-            
-            # Convert to uint8 for cv2
-            # Ensure binary 0/1
-            m1_uint8 = (m1 > 0.5).astype(np.uint8)
-            m2_uint8 = (m2 > 0.5).astype(np.uint8)
-            
-            # Connected components
-            num_labels, labels = cv2.connectedComponents(m1_uint8)
-            
-            # Create a mask to subtract (initially empty)
-            # Or just modify a copy of m1
-            out_m = m1.copy()
-            
-            for label in range(1, num_labels): # 0 is background
-                component_mask = (labels == label)
-                component_area = np.sum(component_mask)
-                
-                if component_area == 0:
-                    continue
-                
-                # Calculate overlap
-                # m2_uint8[component_mask] gives values of m2 where component is present
-                overlap_count = np.sum(m2_uint8[component_mask])
-                
-                ratio = overlap_count / component_area
-                
-                if ratio >= threshold:
-                    out_m[component_mask] = 0.0
-            
-            result_masks.append(torch.from_numpy(out_m))
-            
-        return (torch.stack(result_masks),)
+
+        masks = mask_to_filter.cpu().numpy()
+        # Ensure binary 0/1
+        references = (mask_reference > 0.5).to(torch.uint8).cpu().numpy()
+
+        def run(i):
+            return self._filter_single(masks[i], references[i % B2], threshold)
+
+        # cv2 / numpy release the GIL, so batch items run in parallel on threads
+        workers = min(B1, os.cpu_count() or 1)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                result_masks = list(pool.map(run, range(B1)))
+        else:
+            result_masks = [run(i) for i in range(B1)]
+
+        return (torch.from_numpy(np.stack(result_masks)),)
 
 NODE_CLASS_MAPPINGS = {
     "MaskFilterByInclusion": MaskFilterByInclusion
@@ -23,8 +23,10 @@ class MaskThresholdToWhite:
     CATEGORY = "🐟Koi-Toolkit"
     DESCRIPTION = "如果mask中白色部分超过阈值比例，则返回全白mask，否则返回原mask"
     
-    RETURN_TYPES = ("MASK", "FLOAT", "BOOLEAN")
-    RETURN_NAMES = ("mask", "white_ratio", "is_converted")
+    RETURN_TYPES = ("MASK", "FLOAT", "BOOLEAN", "FLOAT", "BOOLEAN")
+    RETURN_NAMES = ("mask", "white_ratio", "is_converted", "white_ratios", "converted_flags")
+    # 后两个输出为逐张的比例与转换标志列表
+    OUTPUT_IS_LIST = (False, False, False, True, True)
     
     FUNCTION = "process"
     
@@ -34,40 +36,29 @@ class MaskThresholdToWhite:
             mask = mask.unsqueeze(0)
         
         batch_size = mask.shape[0]
-        result_masks = []
-        ratios = []
-        converted_flags = []
+        total_pixels = mask[0].numel() if batch_size > 0 else 0
         
-        for i in range(batch_size):
-            current_mask = mask[i]
-            
-            # 计算白色像素比例（值>0.5视为白色）
-            total_pixels = current_mask.numel()
-            white_pixels = (current_mask > 0.5).sum().item()
-            white_ratio = white_pixels / total_pixels if total_pixels > 0 else 0.0
-            
-            ratios.append(white_ratio)
-            
-            # 判断是否超过阈值
-            if white_ratio >= threshold:
-                # 超过阈值，返回全白mask
-                result_mask = torch.ones_like(current_mask)
-                converted_flags.append(True)
-            else:
-                # 未超过阈值，返回原mask
-                result_mask = current_mask
-                converted_flags.append(False)
-            
-            result_masks.append(result_mask)
+        # 整批一次归约计算白色像素数（值>0.5视为白色），只把 B 个计数拷回主机
+        if total_pixels > 0:
+            white_pixels = (mask > 0.5).reshape(batch_size, -1).sum(dim=1).cpu()
+            # 比例按 float64 计算并比较，与逐张 Python 除法的结果一致（如 70/100 为 0.7 而不是 0.699999988）
+            ratios = white_pixels.double() / total_pixels
+        else:
+            ratios = torch.zeros(batch_size, dtype=torch.float64)
         
-        # 合并结果
-        result = torch.stack(result_masks, dim=0)
+        # 超过阈值的返回全白mask，其余保持原mask
+        converted = ratios >= threshold
+        flags = converted.to(mask.device).view(-1, 1, 1)
+        result = torch.where(flags, torch.ones((), dtype=mask.dtype, device=mask.device), mask)
         
-        # 返回第一个batch的比例和转换标志（用于单张mask场景）
-        avg_ratio = sum(ratios) / len(ratios) if ratios else 0.0
-        any_converted = any(converted_flags)
+        ratio_list = ratios.tolist()
+        flag_list = converted.tolist()
         
-        return (result, avg_ratio, any_converted)
+        # 返回整批的平均比例和是否有任意一张被转换（用于单张mask场景）
+        avg_ratio = sum(ratio_list) / len(ratio_list) if ratio_list else 0.0
+        any_converted = any(flag_list)
+        
+        return (result, avg_ratio, any_converted, ratio_list, flag_list)
 
 
 NODE_CLASS_MAPPINGS = {
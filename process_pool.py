@@ -0,0 +1,117 @@
+"""SVG 节点共用的进程池（svg_potrace 追踪、svg_raster 渲染）。
+
+ComfyUI 以自定义节点目录的文件路径作为包名加载本插件，spawn / forkserver 启动的子进程无法按这个名称导入任务函数；
+fork 则会复制带 CUDA 与多线程的 ComfyUI 主进程，并不安全。因此：
+
+- 工作进程总是以 spawn 方式启动，并在 initializer 中把插件目录加入 sys.path；
+- spawn 默认会在子进程中以 __mp_main__ 重新执行宿主的 __main__（即 ComfyUI 的 main.py，会运行启动脚本、
+  导入全部节点并初始化 CUDA）。启动工作进程期间暂时隐藏 __main__ 的 __file__ / __spec__，子进程只得到空的主模块；
+- 任务函数取自按文件名（如 svg_potrace）重新加载的同一源文件，子进程可以按这个普通模块名导入；
+- 进程池损坏（BrokenProcessPool）时立即丢弃，返回 None 由调用方改为串行执行。
+
+spawn 的工作进程是全新的解释器，首次启动有数秒开销；进程池常驻复用，只适合大批量任务。
+"""
+import importlib.util
+import multiprocessing
+import multiprocessing.context
+import os
+import site
+import sys
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_pool = None
+_pool_workers = 0
+_lock = threading.Lock()
+# 串行化隐藏 / 恢复 __main__ 属性的过程
+_main_lock = threading.Lock()
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+class _CleanMainProcess(multiprocessing.context.SpawnProcess):
+    """启动时不让子进程重新执行宿主 __main__ 的 spawn 进程。"""
+
+    def start(self):
+        main = sys.modules["__main__"]
+        with _main_lock:
+            # spawn 在 start() 内读取这两个属性决定子进程如何初始化主模块，缺失时不导入
+            saved = {name: main.__dict__[name] for name in ("__file__", "__spec__") if name in main.__dict__}
+            main.__spec__ = None
+            main.__dict__.pop("__file__", None)
+            try:
+                super().start()
+            finally:
+                main.__dict__.pop("__spec__", None)
+                main.__dict__.update(saved)
+
+    def __reduce__(self):
+        # 进程对象本身也要传给子进程，而子进程无法按包名导入本模块，因此以普通 SpawnProcess 的身份传递
+        return object.__new__, (multiprocessing.context.SpawnProcess,), self.__dict__
+
+
+class _CleanMainContext(multiprocessing.context.SpawnContext):
+    # 进程池按需（包括补充崩溃的工作进程时）经 context.Process 启动进程，全部走上面的 start()
+    Process = _CleanMainProcess
+
+
+def _worker_function(module_file, name):
+    """返回 module_file 中的函数 name，其所属模块在子进程中可按文件名导入；模块名已被其他文件占用时返回 None。"""
+    module_name = os.path.splitext(os.path.basename(module_file))[0]
+    with _lock:
+        module = sys.modules.get(module_name)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(module_name, module_file)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            sys.modules[module_name] = module
+        elif os.path.abspath(getattr(module, "__file__", None) or "") != os.path.abspath(module_file):
+            return None
+    return getattr(module, name)
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_CleanMainContext(),
+                                        initializer=site.addsitedir, initargs=(PACKAGE_DIR,))
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def map_in_pool(module_file, name, args_list, workers):
+    """在进程池中执行 name(*args)，按 args_list 的顺序返回结果列表。
+
+    进程池不可用（函数无法按普通模块名导入、工作进程崩溃等）时返回 None，调用方应串行执行；
+    任务本身抛出的异常照常向上传递。
+    """
+    fn = _worker_function(module_file, name)
+    if fn is None:
+        return None
+    pool = _get_pool(workers)
+    try:
+        futures = [pool.submit(fn, *args) for args in args_list]
+        return [f.result() for f in futures]
+    except BrokenProcessPool as e:
+        _discard_pool(pool)
+        print(f"[Koi-Toolkit] process pool unavailable, falling back to serial execution: {e}")
+        return None
+    except CancelledError:
+        # 另一个调用以不同的进程数重建了进程池，本批任务被取消
+        return None
@@ -0,0 +1,48 @@
+"""结构化 SVG 批次（SVG_BATCH 类型）：文档列表 + 每项元数据。
+
+ImageToSVG_Potracer 直接输出该对象，SVGToImage / PreviewSVG / SaveSVG 原生接受，
+避免把大批量结果拼成一个超大字符串再在下游重新拆分。
+"""
+from .svg_raster import split_svg_documents
+
+
+class SVGBatch:
+    """documents[i] 为 SVG 文本；若为 None 则从 paths[i] 指向的文件按需读取（分块流式写盘的结果）。
+    sizes[i] 为 (width, height) 或 None。
+    """
+
+    def __init__(self, documents, sizes=None, paths=None):
+        self.documents = list(documents)
+        count = len(self.documents)
+        self.sizes = list(sizes) if sizes is not None else [None] * count
+        self.paths = list(paths) if paths is not None else [None] * count
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __iter__(self):
+        for i in range(len(self.documents)):
+            yield self.document(i)
+
+    def document(self, i):
+        doc = self.documents[i]
+        if doc is None and self.paths[i]:
+            with open(self.paths[i], "r", encoding="utf-8") as f:
+                doc = f.read()
+        return doc
+
+    def to_string(self):
+        return "\n".join(self)
+
+    @classmethod
+    def from_string(cls, svg_string):
+        return cls(split_svg_documents(svg_string))
+
+
+def as_svg_batch(svg_string=None, svg_batch=None):
+    """节点输入统一为 SVGBatch：优先使用 svg_batch，否则拆分 SVG 字符串。"""
+    if svg_batch is not None:
+        return svg_batch
+    if svg_string:
+        return SVGBatch.from_string(svg_string)
+    raise ValueError("Either SVG_String or svg_batch must be provided")
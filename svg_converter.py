@@ -4,13 +4,15 @@ import random
 import numpy as np
 import torch
 import cv2
-import fitz
 import potrace
 import folder_paths
-from io import BytesIO
-from PIL import Image
+import comfy.utils
+from io import StringIO
 from nodes import SaveImage
-from .imagefunc import pil2tensor
+from .svg_potrace import trace_batch, trace_tiled, threshold_frame
+from .svg_raster import rasterize_svg_batch
+from .svg_batch import SVGBatch, as_svg_batch
+from .file_writer import FSYNC_POLICIES, get_writer, reserve_path
 from skimage import color as skcolor
 from skimage.filters import threshold_otsu, threshold_sauvola, threshold_multiotsu
 from skimage.morphology import remove_small_objects, remove_small_holes, closing, opening, disk
@@ -21,8 +23,17 @@ class SVGToImage:
     @classmethod
     def INPUT_TYPES(cls):
         return {
-            "required": {
-                "SVG_String": ("STRING", {"forceInput": True})
+            "required": {},
+            "optional": {
+                "SVG_String": ("STRING", {"forceInput": True}),
+                # 结构化批次，优先于 SVG_String
+                "svg_batch": ("SVG_BATCH",),
+                # 目标宽高（0 表示按 SVG 自身尺寸；只给一边时保持宽高比），优先于 dpi
+                "width": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 1}),
+                "height": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 1}),
+                # 0 表示默认 72 DPI（1 SVG 像素 = 1 输出像素）
+                "dpi": ("INT", {"default": 0, "min": 0, "max": 2400, "step": 1}),
+                "workers": ("INT", {"default": 1, "min": 0, "max": 64, "tooltip": "批量渲染进程数，1 为串行，0 为自动；多进程首次启动需数秒，仅适合大批量"}),
             }
         }
 
@@ -30,33 +41,33 @@ class SVGToImage:
     FUNCTION = "convert_svg_to_image"
     CATEGORY = "🐟Koi-Toolkit"
 
-    def convert_svg_to_image(self, SVG_String):
-
-        doc = fitz.open(stream=SVG_String.encode('utf-8'), filetype="svg")
-        page = doc.load_page(0)
-        pix = page.get_pixmap()
-
-        image_data = pix.tobytes("png")
-        pil_image = Image.open(BytesIO(image_data)).convert("RGB")
-
-        return (pil2tensor(pil_image),)
+    def convert_svg_to_image(self, SVG_String="", svg_batch=None, width=0, height=0, dpi=0, workers=1):
+        # 多个拼接的 SVG 文档会输出为一个批次
+        return (rasterize_svg_batch(as_svg_batch(SVG_String, svg_batch), width, height, dpi, workers),)
     
     
 class SaveSVG:
     """保存SVG字符串到文件"""
     def __init__(self):
         self.output_dir = folder_paths.get_output_directory()
+        # 上次执行中尚未确认结果的后台写入，失败会在下一次执行时报错
+        self._pending_writes = []
 
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "SVG_String": ("STRING", {"forceInput": True}),              
                 "filename_prefix": ("STRING", {"default": "ComfyUI_SVG"}),
             },
             "optional": {
+                "SVG_String": ("STRING", {"forceInput": True}),
+                # 结构化批次：每个文档单独保存为 前缀_序号.svg
+                "svg_batch": ("SVG_BATCH",),
                 "append_timestamp": ("BOOLEAN", {"default": True}),
                 "custom_output_path": ("STRING", {"default": "", "multiline": False}),
+                "compress": ("BOOLEAN", {"default": False, "tooltip": "以 gzip 压缩保存为 .svgz"}),
+                "fsync_policy": (FSYNC_POLICIES, {"default": "none", "tooltip": "none 最快；file 同步文件内容；file+dir 同时同步目录"}),
+                "wait_for_write": ("BOOLEAN", {"default": False, "tooltip": "关闭时在后台线程写盘，节点立即返回；写入失败会在该节点下次执行时报错"}),
             }
         }
 
@@ -65,28 +76,65 @@ class SaveSVG:
     OUTPUT_NODE = True
     FUNCTION = "save_svg_file"
 
-    def generate_unique_filename(self, prefix, timestamp=False):
+    def generate_unique_filename(self, prefix, timestamp=False, index=None, ext=".svg"):
+        suffix = "" if index is None else f"_{index:05d}"
         if timestamp:
             timestamp_str = time.strftime("%Y%m%d%H%M%S")
-            return f"{prefix}_{timestamp_str}.svg"
+            return f"{prefix}_{timestamp_str}{suffix}{ext}"
         else:
-            return f"{prefix}.svg"
-
-    def save_svg_file(self, SVG_String, filename_prefix="ComfyUI_SVG", append_timestamp=True, custom_output_path=""):
+            return f"{prefix}{suffix}{ext}"
+
+    def _raise_failed_writes(self):
+        """检查之前在后台排队的写入，有失败的则抛出，未完成的留到下次检查。"""
+        pending = []
+        failures = []
+        for path, future in self._pending_writes:
+            if not future.done():
+                pending.append((path, future))
+            elif future.exception() is not None:
+                failures.append((path, future.exception()))
+        self._pending_writes = pending
+        if failures:
+            details = "; ".join(f"{path}: {e}" for path, e in failures)
+            raise RuntimeError(f"{len(failures)} previous background SVG write(s) failed: {details}") from failures[0][1]
+
+    def save_svg_file(self, filename_prefix="ComfyUI_SVG", SVG_String="", svg_batch=None, append_timestamp=True, custom_output_path="",
+                      compress=False, fsync_policy="none", wait_for_write=False):
         
+        self._raise_failed_writes()
         output_path = custom_output_path if custom_output_path else self.output_dir
         os.makedirs(output_path, exist_ok=True)
-        
-        unique_filename = self.generate_unique_filename(f"{filename_prefix}", append_timestamp)
-        final_filepath = os.path.join(output_path, unique_filename)
-            
-            
-        with open(final_filepath, "w") as svg_file:
-            svg_file.write(SVG_String)
-            
-            
-        ui_info = {"ui": {"saved_svg": unique_filename, "path": final_filepath}}
 
+        if svg_batch is None:
+            if not SVG_String:
+                raise ValueError("Either SVG_String or svg_batch must be provided")
+            items = [(None, SVG_String)]
+        else:
+            items = [(i, svg_batch.document(i)) for i in range(len(svg_batch))]
+
+        # 带时间戳时文件名在排队时预留，同名（如同一秒内）自动追加 _序号，不会互相覆盖；
+        # 不带时间戳时与原先一样覆盖同名文件，同一路径以最后排队的内容为准
+        ext = ".svgz" if compress else ".svg"
+        writer = get_writer()
+        filepaths = []
+        futures = []
+        for index, content in items:
+            stem = self.generate_unique_filename(f"{filename_prefix}", append_timestamp, index, ext="")
+            final_filepath = reserve_path(output_path, stem, ext, overwrite=not append_timestamp)
+            filepaths.append(final_filepath)
+            futures.append(writer.submit(final_filepath, content, compress, fsync_policy))
+
+        if wait_for_write:
+            for future in futures:
+                future.result()
+        else:
+            self._pending_writes.extend(zip(filepaths, futures))
+
+        filenames = [os.path.basename(path) for path in filepaths]
+        if svg_batch is None:
+            ui_info = {"ui": {"saved_svg": filenames[0], "path": filepaths[0]}}
+        else:
+            ui_info = {"ui": {"saved_svg": filenames, "path": filepaths}}
         return ui_info
 
 
@@ -97,8 +145,14 @@ class PreviewSVG(SaveImage):
     @classmethod
     def INPUT_TYPES(s):
         return {
-            "required": {
-                "SVG_String": ("STRING", {"forceInput": True})
+            "required": {},
+            "optional": {
+                "SVG_String": ("STRING", {"forceInput": True}),
+                "svg_batch": ("SVG_BATCH",),
+                "width": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 1}),
+                "height": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 1}),
+                "dpi": ("INT", {"default": 0, "min": 0, "max": 2400, "step": 1}),
+                "workers": ("INT", {"default": 1, "min": 0, "max": 64, "tooltip": "批量渲染进程数，1 为串行，0 为自动；多进程首次启动需数秒，仅适合大批量"}),
             }
         }
 
@@ -112,15 +166,9 @@ class PreviewSVG(SaveImage):
         self.prefix_append = "_temp_" + ''.join(random.choice("abcdefghijklmnopqrstupvxyz1234567890") for x in range(5))
         self.compress_level = 4
 
-    def svg_preview(self, SVG_String):
-        doc = fitz.open(stream=SVG_String.encode('utf-8'), filetype="svg")
-        page = doc.load_page(0)
-        pix = page.get_pixmap()
-
-        image_data = pix.tobytes("png")
-        pil_image = Image.open(BytesIO(image_data)).convert("RGB")
-
-        preview = pil2tensor(pil_image)
+    def svg_preview(self, SVG_String="", svg_batch=None, width=0, height=0, dpi=0, workers=1):
+        # 与 SVGToImage 共用渲染缓存，重复预览同一矢量图不再重新渲染
+        preview = rasterize_svg_batch(as_svg_batch(SVG_String, svg_batch), width, height, dpi, workers)
 
         return self.save_images(preview, "PointPreview")
 
@@ -158,10 +206,20 @@ class ImageToSVG_Potracer:
                 "background_color": ("STRING", {"widget": "color", "default": "#FFFFFF"}),
                 "stroke_color": ("STRING", {"widget": "color", "default": "#FF0000"}),
                 "stroke_width": ("FLOAT", {"default": 0.0, "min": 0.0, "step": 0.5}),
+                "workers": ("INT", {"default": 1, "min": 0, "max": 64, "tooltip": "追踪进程数，1 为串行，0 为自动；多进程首次启动需数秒，仅适合大批量"}),
+                "parallel_min_batch": ("INT", {"default": 4, "min": 1, "max": 1024, "tooltip": "待追踪帧数少于该值时串行处理"}),
+                "path_precision": ("INT", {"default": 2, "min": 0, "max": 6, "tooltip": "路径坐标保留的小数位数"}),
+                "relative_paths": ("BOOLEAN", {"default": False, "tooltip": "使用相对路径命令以缩小输出"}),
+                "tile_size": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 64, "tooltip": "分块追踪的块大小，0 为整帧追踪"}),
+                "tile_overlap": ("INT", {"default": 32, "min": 0, "max": 512, "tooltip": "分块追踪时每块向外扩展的像素数"}),
+                "tiled_output_path": ("STRING", {"default": "", "tooltip": "分块模式下直接流式写入该 SVG 文件（批量时追加 _序号），输出改为文件路径"}),
+                # 默认保持拼接：已有工作流的 STRING 输出连线在加载后行为不变；大批量时关闭并改用 svg_batch 输出
+                "join_output": ("BOOLEAN", {"default": True, "tooltip": "拼接 STRING 输出（兼容旧工作流）；大批量时关闭，只使用 svg_batch 以免生成数 MB 的字符串"}),
             }
         }
 
-    RETURN_TYPES = ("STRING",)
+    RETURN_TYPES = ("STRING", "SVG_BATCH")
+    RETURN_NAMES = ("STRING", "svg_batch")
     FUNCTION = "vectorize"
     CATEGORY = "🐟Koi-Toolkit"
 
@@ -169,127 +227,100 @@ class ImageToSVG_Potracer:
                   input_foreground="Black on White", optimize_curve=True,
                   zero_sharp_corners=False,
                   foreground_color="#000000", background_color="#FFFFFF",
-                  stroke_color="#FF0000", stroke_width=0.0):
+                  stroke_color="#FF0000", stroke_width=0.0,
+                  workers=1, parallel_min_batch=4, path_precision=2, relative_paths=False,
+                  tile_size=0, tile_overlap=32, tiled_output_path="", join_output=True):
         
         image_np = image.cpu().numpy()
-        batch_svg_strings = []
+        batch_svg_strings = [None] * len(image_np)
+
+        params = {
+            "turdsize": int(turdsize) if turdsize is not None else 0,
+            "turnpolicy": self.turnpolicy_map.get(turnpolicy, turnpolicy),
+            "alphamax": 1.34 if zero_sharp_corners else corner_threshold,
+            "opticurve": optimize_curve,
+            "opttolerance": opttolerance,
+            "foreground_color": foreground_color,
+            "background_color": background_color,
+            "stroke_color": stroke_color,
+            "stroke_width": stroke_width,
+            "precision": int(path_precision),
+            "relative": bool(relative_paths),
+        }
 
-        for i, single_image_np in enumerate(image_np):
-            orig_width_temp, orig_height_temp = (single_image_np.shape[1], single_image_np.shape[0]) if single_image_np.ndim >= 2 else (100,100)
-            svg_data_for_current_image = f'<svg width="{orig_width_temp}" height="{orig_height_temp}"><desc>Error: Processing failed before SVG generation for image {i}</desc></svg>'
+        threshold_norm = threshold / 255.0
+        invert = input_foreground == "Black on White"
+
+        if tile_size > 0:
+            batch = self._vectorize_tiled(image_np, threshold_norm, invert, params, tile_size, tile_overlap, tiled_output_path)
+            if tiled_output_path:
+                return ("\n".join(batch.paths), batch)
+            return (batch.to_string() if join_output else "", batch)
 
+        # 先串行完成阈值化（开销小），需要追踪的帧再统一交给 trace_batch
+        trace_indices = []
+        trace_bitmaps = []
+
+        for i, single_image_np in enumerate(image_np):
             try:
-                pil_img = Image.fromarray((single_image_np * 255).astype(np.uint8))
-                orig_width, orig_height = pil_img.size
+                orig_height, orig_width = single_image_np.shape[:2]
 
                 if orig_width <= 0 or orig_height <= 0:
-                    error_svg = f'<svg width="1" height="1"><desc>Error: Invalid image dimensions for image {i}</desc></svg>'
-                    batch_svg_strings.append(error_svg)
+                    batch_svg_strings[i] = f'<svg width="1" height="1"><desc>Error: Invalid image dimensions for image {i}</desc></svg>'
                     continue
 
-                threshold_norm = threshold / 255.0
-                if single_image_np.ndim == 3:
-                    binary_np = single_image_np[:, :, 0] < threshold_norm if single_image_np.shape[2] > 1 else single_image_np[:,:,0] < threshold_norm
-                elif single_image_np.ndim == 2:
-                    binary_np = single_image_np < threshold_norm
-                else:
-                    error_svg = f'<svg width="{orig_width}" height="{orig_height}"><desc>Error: Unexpected image dimensions for image {i}</desc></svg>'
-                    batch_svg_strings.append(error_svg)
+                if single_image_np.ndim not in (2, 3):
+                    batch_svg_strings[i] = f'<svg width="{orig_width}" height="{orig_height}"><desc>Error: Unexpected image dimensions for image {i}</desc></svg>'
                     continue
-
-                if input_foreground == "Black on White":
-                    binary_np = ~binary_np
+                binary_np = threshold_frame(single_image_np, threshold_norm, invert)
 
                 if np.all(binary_np) or not np.any(binary_np):
-                    skipped_svg = f'<svg width="{orig_width}" height="{orig_height}"><desc>Potracer: Skipped blank image {i}</desc></svg>'
-                    batch_svg_strings.append(skipped_svg)
+                    batch_svg_strings[i] = f'<svg width="{orig_width}" height="{orig_height}"><desc>Potracer: Skipped blank image {i}</desc></svg>'
                     continue
 
-                turdsize_int = int(turdsize) if turdsize is not None else 0
-                policy_arg = self.turnpolicy_map.get(turnpolicy, turnpolicy)
-                alphamax_value_to_use = 1.34 if zero_sharp_corners else corner_threshold
-                scale = 1.0
-
-                bm = potrace.Bitmap(binary_np)
-                plist = bm.trace(
-                    turdsize=turdsize_int,
-                    turnpolicy=policy_arg,
-                    alphamax=alphamax_value_to_use,
-                    opticurve=optimize_curve,
-                    opttolerance=opttolerance
-                )
-
-                scaled_width = max(1, round(orig_width * scale))
-                scaled_height = max(1, round(orig_height * scale))
-                svg_header = f'<svg version="1.1" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="{scaled_width}" height="{scaled_height}" viewBox="0 0 {scaled_width} {scaled_height}">'
-                svg_footer = "</svg>"
-                background_rect = ""
-                bg_color_lower = background_color.lower()
-
-                if bg_color_lower != "none" and bg_color_lower != "":
-                    background_rect = f'<rect width="100%" height="100%" fill="{background_color}"/>'
-
-                scaled_stroke_width = stroke_width * scale
-                stroke_attr = f'stroke="{stroke_color}" stroke-width="{scaled_stroke_width}"' if scaled_stroke_width > 0 and stroke_color.lower() != "none" else 'stroke="none"'
-                fill_attr = f'fill="{foreground_color}"' if foreground_color.lower() != "none" else 'fill="none"'
-                if fill_attr == 'fill="none"' and stroke_attr == 'stroke="none"':
-                    fill_attr = 'fill="black"'
-
-                all_paths_svg_parts = []
-                if plist:
-                    fill_rule_to_use = "evenodd"
-                    for curve in plist:
-                        if not (hasattr(curve, 'start_point') and hasattr(curve.start_point, 'x') and hasattr(curve.start_point, 'y')):
-                            continue
-                        fs = curve.start_point
-                        all_paths_svg_parts.append(f"M{fs.x * scale:.2f},{fs.y * scale:.2f}")
-
-                        if not hasattr(curve, 'segments'):
-                            continue
-                        for segment in curve.segments:
-                            valid_segment = True
-                            if not (hasattr(segment, 'is_corner') and hasattr(segment, 'end_point') and hasattr(segment.end_point, 'x') and hasattr(segment.end_point, 'y')):
-                                valid_segment = False
-
-                            if valid_segment and segment.is_corner:
-                                if not (hasattr(segment, 'c') and hasattr(segment.c, 'x') and hasattr(segment.c, 'y')):
-                                    valid_segment = False
-                                else:
-                                    c_x = segment.c.x * scale
-                                    c_y = segment.c.y * scale
-                                    ep_x = segment.end_point.x * scale
-                                    ep_y = segment.end_point.y * scale
-                                    all_paths_svg_parts.append(f"L{c_x:.2f},{c_y:.2f}L{ep_x:.2f},{ep_y:.2f}")
-                            elif valid_segment:
-                                if not (hasattr(segment, 'c1') and hasattr(segment.c1, 'x') and hasattr(segment.c1, 'y') and \
-                                        hasattr(segment, 'c2') and hasattr(segment.c2, 'x') and hasattr(segment.c2, 'y')):
-                                    valid_segment = False
-                                else:
-                                    c1_x = segment.c1.x * scale; c1_y = segment.c1.y * scale
-                                    c2_x = segment.c2.x * scale; c2_y = segment.c2.y * scale
-                                    ep_x = segment.end_point.x * scale; ep_y = segment.end_point.y * scale
-                                    all_paths_svg_parts.append(f"C{c1_x:.2f},{c1_y:.2f} {c2_x:.2f},{c2_y:.2f} {ep_x:.2f},{ep_y:.2f}")
-                        all_paths_svg_parts.append("Z")
-
-                    if all_paths_svg_parts:
-                        path_d_attribute = "".join(all_paths_svg_parts)
-                        path_element = f'<path {stroke_attr} {fill_attr} fill-rule="{fill_rule_to_use}" d="{path_d_attribute}"/>'
-                        svg_data_for_current_image = svg_header + background_rect + path_element + svg_footer
-                    else:
-                        svg_data_for_current_image = f'{svg_header}<desc>Potracer: Path data generation failed for image {i}</desc>{svg_footer}'
-                else:
-                    svg_data_for_current_image = f'{svg_header}<desc>Potracer: No paths found for image {i}</desc>{svg_footer}'
-
-                batch_svg_strings.append(svg_data_for_current_image)
+                trace_indices.append(i)
+                trace_bitmaps.append(binary_np)
 
             except Exception as e:
-                error_svg_content = f'<svg width="100" height="100"><desc>Error processing image {i}: {type(e).__name__} - {str(e).replace("<", "&lt;").replace(">", "&gt;")}</desc></svg>'
-                batch_svg_strings.append(error_svg_content)
-                continue
-
-        output_string_joined = "\n".join(batch_svg_strings)
-
-        return (output_string_joined,)
+                batch_svg_strings[i] = f'<svg width="100" height="100"><desc>Error processing image {i}: {type(e).__name__} - {str(e).replace("<", "&lt;").replace(">", "&gt;")}</desc></svg>'
+
+        if trace_indices:
+            traced = trace_batch(np.stack(trace_bitmaps), trace_indices, params, workers, parallel_min_batch)
+            for i, svg in zip(trace_indices, traced):
+                batch_svg_strings[i] = svg
+
+        sizes = [(frame.shape[1], frame.shape[0]) for frame in image_np]
+        batch = SVGBatch(batch_svg_strings, sizes=sizes)
+        output_string_joined = "\n".join(batch_svg_strings) if join_output else ""
+
+        return (output_string_joined, batch)
+
+    def _vectorize_tiled(self, image_np, threshold_norm, invert, params, tile_size, tile_overlap, output_path):
+        """逐帧分块追踪并返回 SVGBatch；指定 output_path 时 SVG 直接流式写入文件，批次中只记录文件路径。"""
+        frame_count = len(image_np)
+        height, width = image_np.shape[1], image_np.shape[2]
+        tiles_per_frame = -(-height // tile_size) * -(-width // tile_size)
+        pbar = comfy.utils.ProgressBar(frame_count * tiles_per_frame)
+
+        outputs = []
+        paths = []
+        for i, frame in enumerate(image_np):
+            if output_path:
+                root, ext = os.path.splitext(output_path)
+                path = f"{root}_{i}{ext or '.svg'}" if frame_count > 1 else (output_path if ext else output_path + ".svg")
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as sink:
+                    trace_tiled(frame, threshold_norm, invert, i, params, sink, tile_size, tile_overlap,
+                                progress=lambda done, total: pbar.update(1))
+                outputs.append(None)
+                paths.append(path)
+            else:
+                sink = StringIO()
+                trace_tiled(frame, threshold_norm, invert, i, params, sink, tile_size, tile_overlap,
+                            progress=lambda done, total: pbar.update(1))
+                outputs.append(sink.getvalue())
+                paths.append(None)
+        return SVGBatch(outputs, sizes=[(width, height)] * frame_count, paths=paths)
 
 
 
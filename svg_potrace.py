@@ -0,0 +1,230 @@
+"""Potrace 矢量化核心：位图追踪、SVG 序列化以及多进程批量追踪。
+
+本模块只依赖 numpy 与 potrace，工作进程按普通模块名 svg_potrace 导入它（见 process_pool）。
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+import potrace
+
+try:
+    from .process_pool import default_workers, map_in_pool
+except ImportError:
+    # 在工作进程中作为顶层模块导入时没有上级包，也不需要进程池
+    default_workers = map_in_pool = None
+
+
+def svg_header(width, height):
+    return f'<svg version="1.1" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+
+
+def style_attrs(style, scale=1.0):
+    """根据颜色/描边参数生成 (背景 rect, stroke 属性, fill 属性)。"""
+    background_rect = ""
+    bg_color_lower = style["background_color"].lower()
+    if bg_color_lower != "none" and bg_color_lower != "":
+        background_rect = f'<rect width="100%" height="100%" fill="{style["background_color"]}"/>'
+
+    scaled_stroke_width = style["stroke_width"] * scale
+    stroke_attr = f'stroke="{style["stroke_color"]}" stroke-width="{scaled_stroke_width}"' if scaled_stroke_width > 0 and style["stroke_color"].lower() != "none" else 'stroke="none"'
+    fill_attr = f'fill="{style["foreground_color"]}"' if style["foreground_color"].lower() != "none" else 'fill="none"'
+    if fill_attr == 'fill="none"' and stroke_attr == 'stroke="none"':
+        fill_attr = 'fill="black"'
+    return background_rect, stroke_attr, fill_attr
+
+
+def trace_bitmap(binary_np, params):
+    bm = potrace.Bitmap(binary_np)
+    return bm.trace(
+        turdsize=params["turdsize"],
+        turnpolicy=params["turnpolicy"],
+        alphamax=params["alphamax"],
+        opticurve=params["opticurve"],
+        opttolerance=params["opttolerance"],
+    )
+
+
+def _path_templates(precision, relative):
+    num = "{:.%df}" % precision
+    pair = num + "," + num
+    if relative:
+        return "M" + pair, "l" + pair + "l" + pair, "c" + pair + " " + pair + " " + pair, "z"
+    return "M" + pair, "L" + pair + "L" + pair, "C" + pair + " " + pair + " " + pair, "Z"
+
+
+def path_data(plist, scale=1.0, precision=2, relative=False, offset=(0.0, 0.0)):
+    """将 Potrace 路径序列化为 SVG path 的 d 属性。
+
+    先一次性收集所有坐标到 NumPy 数组并批量缩放/取相对坐标，
+    再用预先拼好的格式模板一次 format 出整段字符串，避免逐段 f-string。
+    relative=True 时除子路径起点外均使用相对命令 (l/c)，可明显缩小输出。
+    offset 为缩放后叠加的 (x, y) 平移，用于分块追踪时把块内坐标映射回画布。
+    """
+    move_t, corner_t, curve_t, close_t = _path_templates(precision, relative)
+    coords = []
+    refs = []
+    pieces = []
+    n = 0
+    for curve in plist:
+        p = curve.start_point
+        coords += (p.x, p.y)
+        refs.append(-1)
+        pieces.append(move_t)
+        cur = n
+        n += 1
+        for segment in curve.segments:
+            end = segment.end_point
+            if segment.is_corner:
+                c = segment.c
+                coords += (c.x, c.y, end.x, end.y)
+                refs += (cur, n)
+                pieces.append(corner_t)
+                n += 2
+            else:
+                c1 = segment.c1
+                c2 = segment.c2
+                coords += (c1.x, c1.y, c2.x, c2.y, end.x, end.y)
+                refs += (cur, cur, cur)
+                pieces.append(curve_t)
+                n += 3
+            cur = n - 1
+        pieces.append(close_t)
+
+    if not n:
+        return ""
+
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if scale != 1.0:
+        points = points * scale
+    if offset[0] or offset[1]:
+        points = points + np.asarray(offset, dtype=np.float64)
+    if relative:
+        # 先按精度取整再求差，避免相对坐标的舍入误差沿路径累积
+        points = np.round(points, precision)
+        refs = np.asarray(refs)
+        rel = refs >= 0
+        points[rel] = points[rel] - points[refs[rel]]
+    return "".join(pieces).format(*points.ravel().tolist())
+
+
+def threshold_frame(frame, threshold_norm, invert):
+    """单帧 (H,W,C) 或 (H,W) 取第一通道做阈值化，返回 bool 位图；frame 可以是任意子区域视图。"""
+    if frame.ndim == 3:
+        binary_np = frame[:, :, 0] < threshold_norm
+    elif frame.ndim == 2:
+        binary_np = frame < threshold_norm
+    else:
+        raise ValueError(f"Unexpected image dimensions {frame.shape}")
+    return ~binary_np if invert else binary_np
+
+
+def trace_to_svg(binary_np, index, params):
+    """追踪单帧二值位图 (H,W bool) 并返回完整 SVG 文档字符串。"""
+    scale = 1.0
+    orig_height, orig_width = binary_np.shape
+    try:
+        plist = trace_bitmap(binary_np, params)
+
+        scaled_width = max(1, round(orig_width * scale))
+        scaled_height = max(1, round(orig_height * scale))
+        header = svg_header(scaled_width, scaled_height)
+        footer = "</svg>"
+        background_rect, stroke_attr, fill_attr = style_attrs(params, scale)
+
+        if not plist:
+            return f'{header}<desc>Potracer: No paths found for image {index}</desc>{footer}'
+
+        path_d_attribute = path_data(plist, scale, params.get("precision", 2), params.get("relative", False))
+        if not path_d_attribute:
+            return f'{header}<desc>Potracer: Path data generation failed for image {index}</desc>{footer}'
+        path_element = f'<path {stroke_attr} {fill_attr} fill-rule="evenodd" d="{path_d_attribute}"/>'
+        return header + background_rect + path_element + footer
+    except Exception as e:
+        return f'<svg width="100" height="100"><desc>Error processing image {index}: {type(e).__name__} - {str(e).replace("<", "&lt;").replace(">", "&gt;")}</desc></svg>'
+
+
+# ---- 多进程批量追踪 ----
+
+def _trace_shared(name, shape, slot, index, params):
+    # 工作进程与父进程共用 resource_tracker，由父进程负责 unlink
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        bitmaps = np.ndarray(shape, dtype=np.bool_, buffer=shm.buf)
+        # 拷贝出当前帧，避免 potrace 持有共享缓冲区的引用
+        return trace_to_svg(np.array(bitmaps[slot]), index, params)
+    finally:
+        shm.close()
+
+
+def trace_batch(bitmaps, indices, params, workers=1, min_parallel=4):
+    """追踪一组同尺寸二值位图 (N,H,W bool)，按顺序返回 SVG 字符串列表。
+
+    workers==1（默认）串行执行，workers<=0 表示自动选择进程数；帧数少于 min_parallel 时串行执行。
+    位图通过共享内存传给工作进程，避免逐帧序列化；进程池不可用时退回串行。
+    """
+    count = len(indices)
+    if map_in_pool is not None and workers <= 0:
+        workers = default_workers()
+    if map_in_pool is None or min(workers, count) <= 1 or count < min_parallel:
+        return [trace_to_svg(bitmaps[slot], index, params) for slot, index in enumerate(indices)]
+
+    bitmaps = np.ascontiguousarray(bitmaps, dtype=np.bool_)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, bitmaps.nbytes))
+    try:
+        np.ndarray(bitmaps.shape, dtype=np.bool_, buffer=shm.buf)[:] = bitmaps
+        results = map_in_pool(__file__, "_trace_shared",
+                              [(shm.name, bitmaps.shape, slot, index, params) for slot, index in enumerate(indices)],
+                              workers)
+    finally:
+        shm.close()
+        shm.unlink()
+    if results is None:
+        return [trace_to_svg(bitmaps[slot], index, params) for slot, index in enumerate(indices)]
+    return results
+
+
+# ---- 分块流式追踪 ----
+
+def trace_tiled(frame, threshold_norm, invert, index, params, sink, tile_size, overlap=32, progress=None):
+    """将超大单帧按块追踪，并把 SVG 流式写入 sink（任意带 write 方法的对象）。
+
+    每块向四周扩展 overlap 像素后再阈值化与追踪，使跨越接缝的形状在两侧都有完整上下文；
+    输出时用 clipPath 把每块裁回其核心区域，相邻块的路径在接缝处无缝拼合。
+    内存占用只与块大小有关，与画布尺寸无关。progress(done, total) 在每块完成后调用。
+    """
+    height, width = frame.shape[0], frame.shape[1]
+    tile_size = max(1, int(tile_size))
+    overlap = max(0, int(overlap))
+    precision = params.get("precision", 2)
+    relative = params.get("relative", False)
+    background_rect, stroke_attr, fill_attr = style_attrs(params)
+
+    sink.write(svg_header(width, height))
+    sink.write(background_rect)
+
+    rows = range(0, height, tile_size)
+    cols = range(0, width, tile_size)
+    total = len(rows) * len(cols)
+    done = 0
+    for y0 in rows:
+        for x0 in cols:
+            y1 = min(height, y0 + tile_size)
+            x1 = min(width, x0 + tile_size)
+            ey0, ex0 = max(0, y0 - overlap), max(0, x0 - overlap)
+            ey1, ex1 = min(height, y1 + overlap), min(width, x1 + overlap)
+
+            bitmap = threshold_frame(frame[ey0:ey1, ex0:ex1], threshold_norm, invert)
+            if bitmap.any():
+                plist = trace_bitmap(bitmap, params)
+                d = path_data(plist, 1.0, precision, relative, offset=(ex0, ey0)) if plist else ""
+                if d:
+                    clip_id = f"koi{index}t{done}"
+                    sink.write(
+                        f'<clipPath id="{clip_id}"><rect x="{x0}" y="{y0}" width="{x1 - x0}" height="{y1 - y0}"/></clipPath>'
+                        f'<path clip-path="url(#{clip_id})" {stroke_attr} {fill_attr} fill-rule="evenodd" d="{d}"/>'
+                    )
+            done += 1
+            if progress is not None:
+                progress(done, total)
+
+    sink.write("</svg>")
@@ -0,0 +1,145 @@
+"""SVG 栅格化：SVGToImage / PreviewSVG 共用。
+
+直接从 pix.samples 构建数组（不经 PNG 编解码），支持目标宽高或 DPI，
+并按 (SVG 哈希, 尺寸) 缓存最近的渲染结果。
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import fitz
+import numpy as np
+import torch
+
+try:
+    from .process_pool import default_workers, map_in_pool
+except ImportError:
+    # 在工作进程中作为顶层模块 svg_raster 导入时没有上级包，也不需要进程池
+    default_workers = map_in_pool = None
+
+# 渲染结果 LRU 容量（条目数）
+RASTER_CACHE_SIZE = 32
+# 渲染结果的总字节上限（按 arr.nbytes 计），超过上限的单个结果不缓存
+RASTER_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+_SVG_DOC_RE = re.compile(r"<svg\b.*?</svg\s*>", re.S | re.I)
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def split_svg_documents(svg_string):
+    """拆分由多个 SVG 文档拼接而成的字符串（如 ImageToSVG_Potracer 的批量输出）。"""
+    docs = _SVG_DOC_RE.findall(svg_string)
+    return docs if docs else [svg_string]
+
+
+def _render(svg, width, height, dpi):
+    doc = fitz.open(stream=svg.encode("utf-8"), filetype="svg")
+    try:
+        page = doc.load_page(0)
+        rect = page.rect
+        if width > 0 or height > 0:
+            sx = width / rect.width if width > 0 else None
+            sy = height / rect.height if height > 0 else None
+            # 只给出一边时保持宽高比
+            sx = sx if sx is not None else sy
+            sy = sy if sy is not None else sx
+        else:
+            sx = sy = (dpi / 72.0) if dpi > 0 else 1.0
+        pix = page.get_pixmap(matrix=fitz.Matrix(sx, sy), alpha=False)
+        samples = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+        arr = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        if pix.n == 1:
+            arr = np.repeat(arr, 3, axis=2)
+        elif pix.n > 3:
+            arr = arr[:, :, :3]
+        # 复制一份，脱离 pixmap 的缓冲区生命周期
+        return np.array(arr)
+    finally:
+        doc.close()
+
+
+def _cache_key(svg, width, height, dpi):
+    return (hashlib.sha1(svg.encode("utf-8")).hexdigest(), int(width), int(height), float(dpi))
+
+
+def _cache_get(key):
+    with _cache_lock:
+        arr = _cache.get(key)
+        if arr is not None:
+            _cache.move_to_end(key)
+        return arr
+
+
+def _cache_drop(key):
+    global _cache_bytes
+    _cache_bytes -= _cache.pop(key).nbytes
+
+
+def _cache_put(key, arr):
+    global _cache_bytes
+    arr.setflags(write=False)
+    if arr.nbytes > RASTER_CACHE_MAX_BYTES:
+        return arr
+    with _cache_lock:
+        if key in _cache:
+            _cache_drop(key)
+        _cache[key] = arr
+        _cache_bytes += arr.nbytes
+        while len(_cache) > RASTER_CACHE_SIZE or _cache_bytes > RASTER_CACHE_MAX_BYTES:
+            _cache_drop(next(iter(_cache)))
+    return arr
+
+
+def render_svg_array(svg, width=0, height=0, dpi=0):
+    """渲染单个 SVG 文档为 HxWx3 uint8 数组（只读，来自缓存时为共享对象）。"""
+    key = _cache_key(svg, width, height, dpi)
+    arr = _cache_get(key)
+    if arr is not None:
+        return arr
+    return _cache_put(key, _render(svg, int(width), int(height), float(dpi)))
+
+
+def render_svg_arrays(docs, width=0, height=0, dpi=0, workers=1, min_parallel=4):
+    """按顺序渲染多个 SVG 文档（同一目标尺寸）；未命中缓存的文档数不少于 min_parallel 时可用进程池并行渲染。
+
+    PyMuPDF 不是线程安全的，因此并行渲染使用进程池（见 process_pool）。
+    workers==1（默认）串行，workers<=0 表示自动选择；进程池不可用时退回串行。
+    """
+    keys = [_cache_key(svg, width, height, dpi) for svg in docs]
+    arrays = [_cache_get(key) for key in keys]
+    missing = [i for i, arr in enumerate(arrays) if arr is None]
+    args = [(docs[i], int(width), int(height), float(dpi)) for i in missing]
+
+    rendered = None
+    if map_in_pool is not None:
+        workers = default_workers() if workers <= 0 else workers
+        if min(workers, len(missing)) > 1 and len(missing) >= min_parallel:
+            rendered = map_in_pool(__file__, "_render", args, workers)
+    if rendered is None:
+        rendered = [_render(*a) for a in args]
+    for i, arr in zip(missing, rendered):
+        arrays[i] = _cache_put(keys[i], arr)
+    return arrays
+
+
+def arrays_to_tensor(arrays):
+    return torch.from_numpy(np.stack(arrays)).float() / 255.0
+
+
+def rasterize_svg_batch(svgs, width=0, height=0, dpi=0, workers=1):
+    """渲染 SVG 文档为 IMAGE 张量 [B,H,W,3]。
+
+    svgs 可以是拼接了一个或多个文档的字符串，也可以是文档的可迭代对象（如 SVGBatch）。
+    未指定宽高时，后续文档统一渲染到第一个文档的尺寸，以便组成批次。
+    """
+    docs = split_svg_documents(svgs) if isinstance(svgs, str) else list(svgs)
+    first = render_svg_array(docs[0], width, height, dpi)
+    if width > 0 or height > 0:
+        rest = render_svg_arrays(docs[1:], width, height, dpi, workers)
+    else:
+        rest = render_svg_arrays(docs[1:], first.shape[1], first.shape[0], 0, workers)
+    return arrays_to_tensor([first] + rest)
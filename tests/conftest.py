@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 节点模块以包内相对导入为主；这里只测试不依赖 ComfyUI 的独立模块，按顶层模块导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
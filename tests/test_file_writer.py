@@ -0,0 +1,41 @@
+import os
+
+from file_writer import BackgroundWriter, reserve_path
+
+
+def test_overwrite_keeps_last_queued_content(tmp_path):
+    writer = BackgroundWriter(threads=4)
+    (tmp_path / "out.svg").write_text("old")
+    paths = []
+    for i in range(200):
+        path = reserve_path(str(tmp_path), "out", ".svg", overwrite=True)
+        paths.append(path)
+        writer.submit(path, f"<svg>{i}</svg>")
+    writer.flush()
+
+    assert set(paths) == {os.path.join(str(tmp_path), "out.svg")}
+    assert (tmp_path / "out.svg").read_text() == "<svg>199</svg>"
+    # 原子替换不留下临时文件
+    assert sorted(os.listdir(tmp_path)) == ["out.svg"]
+
+
+def test_unique_paths_skip_existing_and_queued_files(tmp_path):
+    writer = BackgroundWriter()
+    (tmp_path / "out.svg").write_text("existing")
+    first = reserve_path(str(tmp_path), "out", ".svg")
+    second = reserve_path(str(tmp_path), "out", ".svg")
+    # 覆盖模式排队中的路径同样视为已占用
+    queued = reserve_path(str(tmp_path), "new", ".svg", overwrite=True)
+    third = reserve_path(str(tmp_path), "new", ".svg")
+
+    assert [os.path.basename(p) for p in (first, second, queued, third)] == ["out_1.svg", "out_2.svg", "new.svg", "new_1.svg"]
+    futures = [writer.submit(p, "x") for p in (first, second, queued, third)]
+    assert [f.result(timeout=10) for f in futures] == [first, second, queued, third]
+    assert (tmp_path / "out.svg").read_text() == "existing"
+
+
+def test_failed_write_is_reported_on_future(tmp_path):
+    writer = BackgroundWriter()
+    path = reserve_path(str(tmp_path / "missing"), "out", ".svg")
+    future = writer.submit(path, "x")
+    assert isinstance(future.exception(timeout=10), FileNotFoundError)
@@ -0,0 +1,114 @@
+import importlib
+import json
+import os
+import sys
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_freepik():
+    """icon_search_freepik 使用包内相对导入；只注册包路径、不执行 __init__，避免加载全部节点。"""
+    if "koi_toolkit" not in sys.modules:
+        package = types.ModuleType("koi_toolkit")
+        package.__path__ = [ROOT]
+        sys.modules["koi_toolkit"] = package
+    return importlib.import_module("koi_toolkit.icon_search_freepik")
+
+
+freepik = load_freepik()
+
+
+class IconServer:
+    """Freepik 图标搜索桩：带 filters[color] 的请求返回 404 "No icons found"，其余按参数返回图标。"""
+
+    def __init__(self):
+        self.queries = []
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                owner.queries.append(query)
+                if "filters[color]" in query:
+                    status, body = 404, {"message": "No icons found"}
+                else:
+                    # 图标 URL 中带上本次请求保留的过滤条件，便于断言命中的是哪一级
+                    tag = "-".join(sorted(k for k in query if k.startswith("filters") or k == "order")) or "term"
+                    body = {"data": [{"thumbnails": [{"url": f"https://icons.test/{tag}/{i}.png"}]}
+                                     for i in range(int(query.get("per_page", 2)))]}
+                    status = 200
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1/icons"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    stub = IconServer()
+    monkeypatch.setattr(freepik.FreepikIconSearch, "BASE_URL", stub.url)
+    monkeypatch.setattr(freepik, "_query_cache", freepik._QueryCache())
+    yield stub
+    stub.close()
+
+
+def search(mode, ttl_minutes=0.0):
+    node = freepik.FreepikIconSearch()
+    return node.search_icons(
+        "key", "en", "cat", 1, 2, 128, "standard", "black", "outline", "one-year", "recent", False, 1,
+        relaxation_mode=mode, timeout=5.0, cache_ttl_minutes=ttl_minutes,
+    )
+
+
+def test_parallel_matches_sequential(server):
+    sequential_icons, sequential_data, _ = search("sequential")
+    parallel_icons, parallel_data, _ = search("parallel")
+    assert parallel_icons == sequential_icons
+    assert parallel_data == sequential_data
+
+
+def test_least_relaxed_rung_wins(server):
+    # 丢弃顺序为 order、period、color……第一个有结果的是刚去掉 color、仍保留 shape 与 icon_type 的那一级
+    expected = [f"https://icons.test/filters[icon_type][]-filters[shape]/{i}.png" for i in range(2)]
+    icons, _, _ = search("sequential")
+    assert icons == expected
+    # 顺序模式找到结果后即停止，不再请求更宽松的级别
+    assert [("order" in q, "filters[period]" in q, "filters[color]" in q) for q in server.queries] == [
+        (True, True, True), (False, True, True), (False, False, True), (False, False, False),
+    ]
+
+    icons, _, _ = search("parallel")
+    assert icons == expected
+
+
+@pytest.mark.parametrize("mode", ["sequential", "parallel"])
+def test_repeated_search_is_served_from_cache(server, mode):
+    first_icons, _, first_stats = search(mode, ttl_minutes=10.0)
+    requests_made = len(server.queries)
+    second_icons, _, second_stats = search(mode, ttl_minutes=10.0)
+
+    assert second_icons == first_icons
+    assert first_stats["hits"] == 0
+    # 顺序模式下第二次运行所需的各级查询全部命中缓存，不再请求服务器
+    assert second_stats["hits"] >= 4
+    if mode == "sequential":
+        assert len(server.queries) == requests_made
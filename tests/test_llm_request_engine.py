@@ -0,0 +1,138 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_request_engine import CircuitOpenError, RequestEngine, RequestEngineError
+
+
+class FaultServer:
+    """按预设脚本依次返回 (状态码, 响应头, 响应体) 的本地桩服务器，脚本用完后返回 200。"""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.hits = []
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                owner.hits.append(time.monotonic())
+                status, headers, body = owner.script.pop(0) if owner.script else (200, {}, {"ok": True})
+                headers = dict(headers)
+                # X-Delay 不发送给客户端，只让服务器在响应前等待对应秒数
+                time.sleep(float(headers.pop("X-Delay", 0)))
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1/chat/completions"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(*script):
+        server = FaultServer(script)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def make_engine(**kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("backoff_max", 0.5)
+    return RequestEngine(**kwargs)
+
+
+def test_429_waits_for_retry_after(serve):
+    server = serve((429, {"Retry-After": "0.3"}, {"error": "slow down"}))
+    result = make_engine().request_json_sync("POST", server.url, json={})
+    assert result == {"ok": True}
+    assert len(server.hits) == 2
+    assert server.hits[1] - server.hits[0] >= 0.25
+
+
+def test_503_then_success(serve):
+    server = serve((503, {}, {"error": "busy"}), (503, {}, {"error": "busy"}))
+    assert make_engine().request_json_sync("POST", server.url, json={}) == {"ok": True}
+    assert len(server.hits) == 3
+
+
+def test_400_is_not_retried_and_keeps_server_message(serve):
+    server = serve((400, {}, {"error": {"message": "bad model: qwen-nope"}}))
+    with pytest.raises(RequestEngineError) as info:
+        make_engine().request_json_sync("POST", server.url, json={})
+    assert len(server.hits) == 1
+    assert info.value.status_code == 400
+    assert "bad model: qwen-nope" in str(info.value)
+
+
+def test_retries_exhausted_raises_last_status(serve):
+    server = serve(*[(500, {}, {"error": "boom"})] * 3)
+    with pytest.raises(RequestEngineError) as info:
+        make_engine(failure_threshold=10).request_json_sync("POST", server.url, json={}, max_retries=2)
+    assert info.value.status_code == 500
+    assert len(server.hits) == 3
+
+
+def test_circuit_opens_after_consecutive_failures(serve):
+    server = serve(*[(500, {}, {"error": "boom"})] * 3)
+    engine = make_engine(failure_threshold=3, reset_timeout=60.0)
+    with pytest.raises(RequestEngineError):
+        engine.request_json_sync("POST", server.url, json={}, max_retries=2)
+    with pytest.raises(CircuitOpenError):
+        engine.request_json_sync("POST", server.url, json={})
+    assert len(server.hits) == 3
+
+
+def test_cancelled_probe_does_not_keep_circuit_open(serve):
+    server = serve((500, {}, {"error": "boom"}), (200, {"X-Delay": "1.0"}, {"ok": True}))
+    engine = make_engine(failure_threshold=1, reset_timeout=0.1)
+    with pytest.raises(RequestEngineError):
+        engine.request_json_sync("POST", server.url, json={}, max_retries=0)
+    time.sleep(0.15)
+
+    # 半开状态下的试探请求被取消，熔断器必须允许下一次试探
+    async def cancelled_probe():
+        await asyncio.wait_for(engine.request_json("POST", server.url, json={}), 0.2)
+
+    with pytest.raises(asyncio.TimeoutError):
+        engine.run_sync(cancelled_probe())
+    assert engine.request_json_sync("POST", server.url, json={}) == {"ok": True}
+
+
+def test_limiter_only_throttles_its_own_requests(serve):
+    server = serve()
+    engine = make_engine()
+    limiter = engine.create_rate_limiter(5.0, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        engine.request_json_sync("POST", server.url, json={}, limiter=limiter)
+    assert time.monotonic() - start >= 0.35
+
+    start = time.monotonic()
+    for _ in range(3):
+        engine.request_json_sync("POST", server.url, json={})
+    assert time.monotonic() - start < 0.35
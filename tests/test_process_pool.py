@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip("potrace")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 模拟 ComfyUI 的 main.py：顶层逻辑没有 __main__ 保护，插件目录以文件路径为包名加载
+MAIN_PY = textwrap.dedent('''
+    import importlib.util, os, sys, types
+
+    with open(os.environ["BOOT_LOG"], "a") as f:
+        f.write(f"{os.getpid()} {__name__}\\n")
+
+    def load(package_dir, name):
+        if package_dir not in sys.modules:
+            package = types.ModuleType(package_dir)
+            package.__path__ = [package_dir]
+            sys.modules[package_dir] = package
+        spec = importlib.util.spec_from_file_location(f"{package_dir}.{name}", os.path.join(package_dir, f"{name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        return module
+
+    if __name__ == "__main__":
+        import numpy as np
+        package_dir = sys.argv[1]
+        process_pool = load(package_dir, "process_pool")
+        svg_potrace = load(package_dir, "svg_potrace")
+        bitmaps = np.random.default_rng(0).random((4, 32, 32)) > 0.5
+        params = {"turdsize": 2, "turnpolicy": 4, "alphamax": 1.0, "opticurve": True, "opttolerance": 0.2}
+        svgs = svg_potrace.trace_batch(bitmaps, list(range(4)), params, workers=2, min_parallel=1)
+        assert svgs == [svg_potrace.trace_to_svg(bitmaps[i], i, params) for i in range(4)]
+        assert process_pool._pool is not None and len(process_pool._pool._processes) == 2
+        assert sys.modules["__main__"].__file__ == os.path.abspath(__file__)
+''')
+
+
+def test_workers_do_not_rerun_host_main(tmp_path):
+    main_py = tmp_path / "main.py"
+    main_py.write_text(MAIN_PY)
+    boot_log = tmp_path / "boots.log"
+    result = subprocess.run(
+        [sys.executable, str(main_py), ROOT], env={**os.environ, "BOOT_LOG": str(boot_log)},
+        capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "falling back to serial" not in result.stdout
+    # 只有宿主进程执行过 main.py，工作进程没有以 __mp_main__ 重新执行它
+    assert boot_log.read_text().split()[1::2] == ["__main__"]